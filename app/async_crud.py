@@ -0,0 +1,209 @@
+import bisect
+import asyncio
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import Select
+
+from app.crud import (
+    adjacent_period,
+    calculate_profit,
+    calculate_total_profit,
+    price_changed,
+    prices_reset,
+    rank_better_companies,
+    stock_changed,
+)
+from app import schemas
+from app.executor import analysis_executor
+from app.models import IngestedFile, Stock, StockPrice
+from app.versions import STOCKS, bump_all_price_versions, bump_versions, price_version_names
+
+
+# Analyze Stock Prices for the specified periods
+async def analyze_stock_prices(
+    session_factory: async_sessionmaker,
+    ticker_symbol: str,
+    start_date: str,
+    end_date: str,
+    better_companies_limit: Optional[int] = None,
+) -> Dict:
+    """
+    Async counterpart of ``app.crud.analyze_stock_prices``.
+
+    The requested, before and after periods are sliced out of one read of
+    ``(date, close_price)`` over their combined span. That read and the
+    cross-ticker comparison are independent, so each runs on its own session
+    and connection at the same time. The profit calculations then run on the
+    analysis executor, keeping the event loop free for other requests.
+    """
+    start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    period_length = (end_date - start_date).days + 1
+
+    before_start, _ = adjacent_period(start_date, period_length, "before")
+    _, after_end = adjacent_period(end_date, period_length, "after")
+    span_prices, (companies, window_prices) = await asyncio.gather(
+        _query_closes(session_factory, ticker_symbol, before_start, after_end),
+        _query_window_prices(session_factory, ticker_symbol, start_date, end_date),
+    )
+    return await analysis_executor.run(
+        _analyze_span,
+        ticker_symbol, start_date, end_date, span_prices, companies, window_prices, better_companies_limit,
+    )
+
+
+def _analyze_span(
+    ticker_symbol: str,
+    start_date,
+    end_date,
+    span_prices: List,
+    companies: List,
+    window_prices: List,
+    better_companies_limit: Optional[int],
+) -> Dict:
+    # The span is ordered by date, so each period is a contiguous run of rows
+    dates = [price.date for price in span_prices]
+    lo = bisect.bisect_left(dates, start_date)
+    hi = bisect.bisect_right(dates, end_date)
+    before_prices, requested_prices, after_prices = span_prices[:lo], span_prices[lo:hi], span_prices[hi:]
+
+    if not requested_prices:
+        raise NoResultFound(f"No data found for ticker {ticker_symbol} in the given range.")
+
+    total_profit = calculate_total_profit(requested_prices)
+    profits = {
+        ticker: calculate_total_profit(list(prices))
+        for ticker, prices in groupby(window_prices, key=lambda row: row.ticker_symbol)
+    }
+    better_companies = rank_better_companies(companies, profits, total_profit, better_companies_limit)
+
+    return {
+        "requested_period": {**calculate_profit(requested_prices), "total_profit": total_profit},
+        "before_period": calculate_profit(before_prices),
+        "after_period": calculate_profit(after_prices),
+        "better_companies": [company["company_name"] for company in better_companies],
+        "better_companies_ranking": better_companies,
+    }
+
+
+async def _query_closes(session_factory: async_sessionmaker, ticker_symbol: str, start_date, end_date) -> List:
+    async with session_factory() as db:
+        result = await db.execute(span_closes_query(ticker_symbol, start_date, end_date))
+        return result.all()
+
+
+async def _query_window_prices(session_factory: async_sessionmaker, target_ticker: str, start_date, end_date):
+    """
+    The other companies and their closes over the window, from one range read.
+    """
+    async with session_factory() as db:
+        companies = (
+            await db.execute(
+                select(Stock.ticker_symbol, Stock.company_name)
+                .where(Stock.ticker_symbol != target_ticker)
+                .order_by(Stock.id)
+            )
+        ).all()
+        rows = (await db.execute(window_prices_query(target_ticker, start_date, end_date))).all()
+    return companies, rows
+
+
+def span_closes_query(ticker_symbol: str, start_date, end_date) -> Select:
+    """
+    Select (date, close_price) of one ticker over a date range, in date order.
+    """
+    return (
+        select(StockPrice.date, StockPrice.close_price)
+        .where(
+            StockPrice.ticker_symbol == ticker_symbol,
+            StockPrice.date >= start_date,
+            StockPrice.date <= end_date,
+        )
+        .order_by(StockPrice.date)
+    )
+
+
+def window_prices_query(target_ticker: str, start_date, end_date) -> Select:
+    """
+    Select (ticker_symbol, date, close_price) of every other ticker over a date range.
+    """
+    return (
+        select(StockPrice.ticker_symbol, StockPrice.date, StockPrice.close_price)
+        .where(
+            StockPrice.ticker_symbol != target_ticker,
+            StockPrice.date >= start_date,
+            StockPrice.date <= end_date,
+        )
+        .order_by(StockPrice.ticker_symbol, StockPrice.date)
+    )
+
+
+# CRUD Operations for Stocks
+async def create_stock(db: AsyncSession, stock: Stock) -> Stock:
+    db.add(stock)
+    await db.run_sync(bump_versions, [STOCKS])
+    await db.commit()
+    await db.refresh(stock)
+    stock_changed(stock.ticker_symbol)
+    return stock
+
+async def get_stock_by_id(db: AsyncSession, stock_id: int) -> Optional[Stock]:
+    return await db.get(Stock, stock_id)
+
+async def get_all_stocks(db: AsyncSession) -> List[Stock]:
+    return list((await db.execute(select(Stock))).scalars())
+
+async def get_all_stock_rows(db: AsyncSession) -> List[Dict]:
+    """
+    Return every stock as a plain dict with the fields of the ``Stock`` schema, in its field order.
+    """
+    fields = tuple(schemas.Stock.model_fields)
+    rows = await db.execute(select(*(getattr(Stock, field) for field in fields)))
+    return [dict(zip(fields, row)) for row in rows]
+
+async def update_stock(db: AsyncSession, stock_id: int, stock_data: dict) -> Optional[Stock]:
+    stock = await db.get(Stock, stock_id)
+    if stock:
+        old_ticker_symbol = stock.ticker_symbol
+        for key, value in stock_data.items():
+            setattr(stock, key, value)
+        await db.run_sync(bump_versions, [STOCKS])
+        await db.commit()
+        await db.refresh(stock)
+        stock_changed(old_ticker_symbol)
+        if stock.ticker_symbol != old_ticker_symbol:
+            stock_changed(stock.ticker_symbol)
+    return stock
+
+async def delete_stock(db: AsyncSession, stock_id: int) -> None:
+    stock = await db.get(Stock, stock_id)
+    if stock:
+        await db.delete(stock)
+        await db.run_sync(bump_versions, [STOCKS])
+        await db.commit()
+        stock_changed(stock.ticker_symbol)
+
+# CRUD Operations for Stock Prices
+async def create_stock_price(db: AsyncSession, stock_price: StockPrice) -> StockPrice:
+    db.add(stock_price)
+    await db.run_sync(bump_versions, price_version_names([stock_price.ticker_symbol]))
+    await db.commit()
+    await db.refresh(stock_price)
+    price_changed(stock_price)
+    return stock_price
+
+async def get_stock_prices_by_ticker(db: AsyncSession, ticker_symbol: str) -> List[StockPrice]:
+    return list((await db.execute(select(StockPrice).where(StockPrice.ticker_symbol == ticker_symbol))).scalars())
+
+async def delete_all_stock_prices(db: AsyncSession) -> None:
+    await db.execute(delete(StockPrice))
+    # Forget ingested files so the next init_db loads them again
+    await db.execute(delete(IngestedFile))
+    await db.run_sync(bump_all_price_versions)
+    await db.commit()
+    prices_reset()
@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import call_with_session, get_async_db, get_async_session_factory
+from app import crud
+from app.cache import analysis_cache
+from app.executor import analysis_executor
+from app.models import Stock as StockModel
+from app.responses import FastJSONResponse
+from app.versions import PRICES, STOCKS, DataVersions, current_versions, not_modified
+from app.schemas import MAX_TRANSACTIONS, Stock, StockCreate, StockPricesAnalysisResponse
+from app.async_crud import (
+    create_stock,
+    get_stock_by_id,
+    get_all_stock_rows,
+    update_stock,
+    delete_stock,
+    analyze_stock_prices,
+)
+
+# Non-blocking versions of the routes in app.routes, mounted ahead of them in async mode
+router = APIRouter()
+
+# CRUD operations for Stocks
+@router.post("/api/stocks", response_model=Stock)
+async def create_stock_entry(stock: StockCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create a new stock entry.
+    """
+    return await create_stock(db, StockModel(**stock.dict()))
+
+
+@router.get("/api/stocks/{stock_id}", response_model=Stock)
+async def get_stock_entry(
+    stock_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    versions: DataVersions = Depends(current_versions),
+):
+    """
+    Retrieve a specific stock by its ID.
+    """
+    etag = versions.etag(STOCKS)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    stock = await get_stock_by_id(db, stock_id)
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    response.headers["ETag"] = etag
+    return stock
+
+
+@router.get("/api/stocks", response_model=List[Stock])
+async def list_stocks(
+    request: Request, db: AsyncSession = Depends(get_async_db), versions: DataVersions = Depends(current_versions)
+):
+    """
+    List all stocks in the database.
+    """
+    etag = versions.etag(STOCKS)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    return FastJSONResponse(await get_all_stock_rows(db), headers={"ETag": etag})
+
+
+@router.put("/api/stocks/{stock_id}", response_model=Stock)
+async def update_stock_entry(stock_id: int, stock_data: StockCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Update a specific stock by its ID.
+    """
+    stock = await update_stock(db, stock_id, stock_data.dict())
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    return stock
+
+
+@router.delete("/api/stocks/{stock_id}", status_code=204)
+async def delete_stock_entry(stock_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete a specific stock by its ID.
+    """
+    await delete_stock(db, stock_id)
+
+
+# Analyze stock prices
+@router.get("/api/stockprices", response_model=StockPricesAnalysisResponse)
+async def analyze_stock_prices_route(
+    request: Request,
+    ticker_symbol: str,
+    start_date: str,
+    end_date: str,
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of better companies to return"),
+    resolution: Optional[str] = Query(
+        None, pattern="^(weekly|monthly|yearly)$", description="Analyze weekly, monthly or yearly closes instead of daily ones"
+    ),
+    max_transactions: Optional[int] = Query(
+        None, ge=1, le=MAX_TRANSACTIONS, description="Add the best plan of at most this many buy/sell round trips"
+    ),
+    fee: float = Query(0.0, ge=0, description="Cost of every round trip in the trading plan"),
+    cooldown: int = Query(0, ge=0, description="Rows to wait after a sell before the next buy in the trading plan"),
+    versions: DataVersions = Depends(current_versions),
+):
+    """
+    Analyze stock prices for a specific ticker symbol and date range.
+    """
+    etag = versions.etag(STOCKS, PRICES)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    if resolution is not None or max_transactions is not None:
+        # Rollups and trading plans work on the price store, which the sync analysis reads
+        key = analysis_cache.key(ticker_symbol, start_date, end_date, limit, resolution)
+        if max_transactions is not None:
+            key = analysis_cache.key(
+                ticker_symbol, start_date, end_date, limit, resolution, max_transactions, fee, cooldown
+            )
+        result = await analysis_cache.get_or_compute_async(
+            key,
+            lambda: analysis_executor.run(
+                call_with_session, crud.analyze_stock_prices, ticker_symbol, start_date, end_date, limit,
+                resolution=resolution, max_transactions=max_transactions, fee=fee, cooldown=cooldown,
+            ),
+        )
+        return FastJSONResponse(result, headers={"ETag": etag})
+    result = await analysis_cache.get_or_compute_async(
+        analysis_cache.key(ticker_symbol, start_date, end_date, limit, None),
+        lambda: analyze_stock_prices(get_async_session_factory(), ticker_symbol, start_date, end_date, limit),
+    )
+    return FastJSONResponse(result, headers={"ETag": etag})
+
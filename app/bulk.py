@@ -0,0 +1,178 @@
+import os
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.crud import upsert_stock_prices
+from app.schemas import StockPriceCreate
+
+# Rows validated and upserted per transaction
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+
+# Rejected rows described individually in a response
+MAX_REPORTED_ERRORS = 100
+
+# Headers of the CSVs in data/, accepted as aliases of the StockPrice fields
+CSV_HEADER_ALIASES = {
+    "Date": "date",
+    "Open": "open_price",
+    "High": "high_price",
+    "Low": "low_price",
+    "Close": "close_price",
+    "Adj Close": "adj_close_price",
+    "Volume": "volume",
+}
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+JSON_MEDIA_TYPES = ("application/json",)
+SUPPORTED_MEDIA_TYPES = JSON_MEDIA_TYPES + NDJSON_MEDIA_TYPES + CSV_MEDIA_TYPES
+
+
+class BulkFormatError(ValueError):
+    """
+    The request body cannot be read as the declared format at all.
+    """
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    pending = b""
+    number = 0
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield number + 1, pending.decode("utf-8").rstrip("\r")
+
+
+async def iter_records(stream: AsyncIterator[bytes], media_type: str) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (line or item number, raw record) pairs from a JSON array, NDJSON or CSV body.
+
+    NDJSON and CSV are parsed line by line as the body arrives; a JSON array
+    has to be received in full first. CSV fields may not contain newlines.
+    """
+    if media_type in NDJSON_MEDIA_TYPES:
+        async for number, line in _iter_lines(stream):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield number, error
+    elif media_type in CSV_MEDIA_TYPES:
+        header = None
+        async for number, line in _iter_lines(stream):
+            if not line.strip():
+                continue
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [CSV_HEADER_ALIASES.get(name.strip(), name.strip()) for name in values]
+                continue
+            yield number, {name: (value.strip() or None) for name, value in zip(header, values)}
+    else:
+        body = b"".join([chunk async for chunk in stream])
+        try:
+            items = json.loads(body)
+        except json.JSONDecodeError as error:
+            raise BulkFormatError(f"Invalid JSON: {error}")
+        if not isinstance(items, list):
+            raise BulkFormatError("Expected a JSON array of stock prices.")
+        for number, item in enumerate(items, start=1):
+            yield number, item
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors())
+    return str(error)
+
+
+class BulkPriceWriter:
+    """
+    Validate raw price records and upsert them chunk by chunk, counting outcomes.
+
+    Every received record ends up in exactly one of inserted, updated,
+    superseded (a later record of the same chunk has its ticker and date) or
+    rejected. A repeat in a later chunk overwrites the row written before and
+    counts as updated.
+
+    Each chunk is validated and written in one worker thread call and one
+    transaction, so the event loop keeps reading the body in between.
+    """
+
+    def __init__(self, db: Session, ticker_symbol: Optional[str] = None, chunk_size: int = BULK_CHUNK_SIZE):
+        self.db = db
+        self.ticker_symbol = ticker_symbol
+        self.chunk_size = chunk_size
+        self.pending: List[Tuple[int, object]] = []
+        self.report = {"received": 0, "inserted": 0, "updated": 0, "superseded": 0, "rejected": 0, "errors": []}
+
+    def _reject(self, number: int, message: str, count: int = 1) -> None:
+        self.report["rejected"] += count
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": number, "error": message})
+
+    async def add(self, number: int, record: object) -> None:
+        self.report["received"] += 1
+        self.pending.append((number, record))
+        if len(self.pending) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.pending:
+            chunk, self.pending = self.pending, []
+            await run_in_threadpool(self._write_chunk, chunk)
+
+    def _write_chunk(self, chunk: List[Tuple[int, object]]) -> None:
+        rows = []
+        for number, record in chunk:
+            if isinstance(record, Exception):
+                self._reject(number, _describe(record))
+                continue
+            if not isinstance(record, dict):
+                self._reject(number, "Expected an object.")
+                continue
+            if self.ticker_symbol and not record.get("ticker_symbol"):
+                record = {**record, "ticker_symbol": self.ticker_symbol}
+            try:
+                rows.append(StockPriceCreate.model_validate(record).model_dump())
+            except ValidationError as error:
+                self._reject(number, _describe(error))
+
+        if not rows:
+            return
+        try:
+            inserted, updated, superseded = upsert_stock_prices(self.db, rows)
+        except SQLAlchemyError as error:
+            self.db.rollback()
+            self._reject(chunk[0][0], f"Chunk not written: {getattr(error, 'orig', None) or error}", len(rows))
+            return
+        self.report["inserted"] += inserted
+        self.report["updated"] += updated
+        self.report["superseded"] += superseded
+
+
+async def write_bulk_prices(
+    db: Session,
+    stream: AsyncIterator[bytes],
+    media_type: str,
+    ticker_symbol: Optional[str] = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> Dict:
+    """
+    Upsert every price record of a request body and return the outcome counts.
+    """
+    writer = BulkPriceWriter(db, ticker_symbol, chunk_size)
+    async for number, record in iter_records(stream, media_type):
+        await writer.add(number, record)
+    await writer.flush()
+    return writer.report
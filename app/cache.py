@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "ticker_symbol", "start_date", "end_date", "tickers")
+
+    def __init__(self, value, size, expires_at, ticker_symbol, start_date, end_date, tickers):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.ticker_symbol = ticker_symbol
+        self.start_date = start_date
+        self.end_date = end_date
+        self.tickers = tickers
+
+
+class AnalysisCache:
+    """
+    Bounded cache of ``analyze_stock_prices`` results.
+
+    Entries are evicted least-recently-used first once either ``max_entries`` or
+    ``max_bytes`` (measured as encoded JSON) is exceeded, and expire after
+    ``ttl_seconds``. Concurrent misses for the same key are coalesced so the
+    analysis runs once. Writes invalidate only the entries whose result they can
+    change; see ``invalidate_prices`` and ``invalidate_stock``.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._bytes = 0
+        # Bumped by every invalidation so results computed before it are not stored
+        self._generation = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def key(ticker_symbol: str, start_date: str, end_date: str, *options) -> Optional[Tuple]:
+        """
+        Build the cache key of an analysis request, or None if its dates do not parse.
+        """
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return None
+        return (ticker_symbol, start, end) + tuple(options)
+
+    def _lookup(self, key: Tuple):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self._counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _store(self, key: Tuple, value: Dict) -> None:
+        # Caller holds the lock
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        tickers = (
+            {key[0]}
+            | {company["ticker_symbol"] for company in value.get("better_companies_ranking", ())}
+            | set(value.get("tickers", ()))
+        )
+        self._entries[key] = _Entry(
+            value, size, time.monotonic() + self.ttl_seconds, key[0], key[1], key[2], tickers
+        )
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def _begin(self, key: Tuple):
+        """
+        Return (cached value, future, owner) for a lookup; the owner must compute.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return entry.value, None, False
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return None, future, False
+
+            self._counters["misses"] += 1
+            future = Future()
+            self._in_flight[key] = future
+            return None, future, True
+
+    def _finish(self, key: Tuple, future: Future, generation: int, value=None, error: BaseException = None) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if error is None and generation == self._generation:
+                self._store(key, value)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, key: Optional[Tuple], compute: Callable[[], Dict]) -> Dict:
+        """
+        Return the cached result for ``key``, computing it at most once across threads.
+        """
+        if key is None or not self.enabled:
+            return compute()
+
+        value, future, owner = self._begin(key)
+        if future is None:
+            return value
+        if not owner:
+            return future.result()
+
+        generation = self._generation
+        try:
+            value = compute()
+        except BaseException as error:
+            self._finish(key, future, generation, error=error)
+            raise
+        self._finish(key, future, generation, value)
+        return value
+
+    async def get_or_compute_async(self, key: Optional[Tuple], compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Async variant of ``get_or_compute``; waiters await instead of blocking the event loop.
+        """
+        if key is None or not self.enabled:
+            return await compute()
+
+        value, future, owner = self._begin(key)
+        if future is None:
+            return value
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        generation = self._generation
+        try:
+            value = await compute()
+        except BaseException as error:
+            self._finish(key, future, generation, error=error)
+            raise
+        self._finish(key, future, generation, value)
+        return value
+
+    def _invalidate(self, predicate: Callable[[_Entry], bool]) -> None:
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if predicate(entry)]
+            for key in stale:
+                self._remove(key)
+            self._counters["invalidations"] += len(stale)
+
+    def invalidate_prices(self, ticker_symbol: str, day: date, last_day: Optional[date] = None) -> None:
+        """
+        Drop results affected by price writes for ``ticker_symbol`` from ``day``
+        through ``last_day`` (default: that day only): every analysis of that
+        ticker, and analyses of other tickers whose window overlaps those days
+        (their better-companies comparison may change).
+        """
+        last_day = last_day or day
+        self._invalidate(
+            lambda entry: entry.ticker_symbol == ticker_symbol
+            or (entry.start_date <= last_day and day <= entry.end_date)
+        )
+
+    def invalidate_stock(self, ticker_symbol: str, price_span: Optional[Tuple[date, date]] = None) -> None:
+        """
+        Drop results affected by creating, renaming or deleting the stock ``ticker_symbol``:
+        analyses of it, analyses listing it as a better company and, when the stock
+        has prices in ``price_span``, analyses whose window overlaps that span.
+        """
+        def affected(entry: _Entry) -> bool:
+            if ticker_symbol in entry.tickers:
+                return True
+            return price_span is not None and entry.start_date <= price_span[1] and price_span[0] <= entry.end_date
+
+        self._invalidate(affected)
+
+    def clear(self) -> None:
+        self._invalidate(lambda entry: True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "in_flight": len(self._in_flight),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Shared cache in front of analyze_stock_prices; ANALYSIS_CACHE_MAX_ENTRIES=0 disables it
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL", "300")),
+)
@@ -1,68 +1,191 @@
+import os
+import numpy as np
+from sqlalchemy import insert, select, update, bindparam
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import NoResultFound
-from typing import List, Dict, Optional
-from app.models import StockPrice, Stock
-from datetime import datetime, timedelta
+from sqlalchemy.sql import Select
+from typing import List, Dict, Optional, Tuple
+from app import kernels, schemas, screener
+from app.models import IngestedFile, StockPrice, Stock
+from app.price_store import PRICE_COLUMNS, PriceSeries, price_store
+from app.cache import analysis_cache
+from app.versions import (
+    STOCKS,
+    TICKER_PRICES_PREFIX,
+    bump_all_price_versions,
+    bump_versions,
+    data_versions,
+    price_version_names,
+)
+from datetime import date, datetime, timedelta
+
+# Tickers per block of the correlation matrix products
+CORRELATION_BLOCK_SIZE = int(os.getenv("CORRELATION_BLOCK_SIZE", "256"))
+
+# Decimals total profits are reported with; sums of the same moves taken in another order only differ beyond them
+TOTAL_PROFIT_DECIMALS = 6
 
 # Analyze Stock Prices for the specified periods
-def analyze_stock_prices(db: Session, ticker_symbol: str, start_date: str, end_date: str) -> Dict:
+def analyze_stock_prices(
+    db: Session,
+    ticker_symbol: str,
+    start_date: str,
+    end_date: str,
+    better_companies_limit: Optional[int] = None,
+    include_better_companies: bool = True,
+    resolution: Optional[str] = None,
+    max_transactions: Optional[int] = None,
+    fee: float = 0.0,
+    cooldown: int = 0,
+) -> Dict:
     """
     Analyze stock prices for maximum profit, total profit, and alternative stocks.
+
+    With a ``resolution`` of "weekly", "monthly" or "yearly" every series is
+    resampled to the closes of its bars (see ``PriceSeries.coarse``), which
+    keeps multi-decade windows cheap; buy and sell dates are then the last
+    trading days of bars.
+
+    With ``max_transactions`` the requested period also gets a ``trading_plan``:
+    the best set of at most that many round trips after ``fee`` per trade and a
+    ``cooldown`` of rows between a sell and the next buy.
     """
     # Convert string dates to datetime objects
     start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
     end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
-    # Query stock prices for the requested period
-    requested_prices = db.query(StockPrice).filter(
-        StockPrice.ticker_symbol == ticker_symbol,
-        StockPrice.date >= start_date,
-        StockPrice.date <= end_date,
-    ).order_by(StockPrice.date).all()
+    series = price_store.get(db, ticker_symbol)
+    if series is not None and resolution is not None:
+        series = series.coarse(resolution)
+    result = analyze_series(
+        db, series, ticker_symbol, start_date, end_date, better_companies_limit, include_better_companies,
+        resolution=resolution,
+    )
+    if max_transactions is not None:
+        lo, hi = series.bounds(start_date, end_date)
+        result["requested_period"]["trading_plan"] = calculate_series_trading_plan(
+            series, lo, hi, max_transactions, fee, cooldown
+        )
+    return result
+
+# Analyze one window of a cached price series
+def analyze_series(
+    db: Session,
+    series: Optional[PriceSeries],
+    ticker_symbol: str,
+    start_date: date,
+    end_date: date,
+    better_companies_limit: Optional[int] = None,
+    include_better_companies: bool = True,
+    companies: Optional[List[Tuple[str, str]]] = None,
+    resolution: Optional[str] = None,
+) -> Dict:
+    """
+    Build the analysis response for [start_date, end_date] of an already fetched series.
+    """
+    # Slice the cached price series for the requested period
+    lo, hi = series.bounds(start_date, end_date) if series is not None else (0, 0)
 
-    if not requested_prices:
+    if lo == hi:
         raise NoResultFound(f"No data found for ticker {ticker_symbol} in the given range.")
 
     # Calculate max profit and total profit for requested period
-    requested_period = calculate_profit(requested_prices)
-    total_profit = calculate_total_profit(requested_prices)
+    requested_period = calculate_series_profit(series, lo, hi)
+    total_profit = calculate_series_total_profit(series, lo, hi)
 
     # Determine the number of days in the requested period
     period_length = (end_date - start_date).days + 1
 
-    # Query and analyze periods before and after
-    before_period = query_and_calculate_period(db, ticker_symbol, start_date, period_length, "before")
-    after_period = query_and_calculate_period(db, ticker_symbol, end_date, period_length, "after")
+    # Analyze periods before and after
+    before_period = calculate_series_period_profit(series, *adjacent_period(start_date, period_length, "before"))
+    after_period = calculate_series_period_profit(series, *adjacent_period(end_date, period_length, "after"))
 
     # Analyze alternative stocks
-    better_companies = get_alternative_stocks(db, ticker_symbol, start_date, end_date, total_profit)
+    better_companies = []
+    if include_better_companies:
+        better_companies = get_alternative_stocks(
+            db, ticker_symbol, start_date, end_date, total_profit, better_companies_limit, companies, resolution
+        )
 
     return {
         "requested_period": {**requested_period, "total_profit": total_profit},
         "before_period": before_period,
         "after_period": after_period,
-        "better_companies": better_companies,
+        "better_companies": [company["company_name"] for company in better_companies],
+        "better_companies_ranking": better_companies,
     }
 
+# Analyze many windows at once
+def analyze_stock_prices_batch(
+    db: Session,
+    items: List[Tuple[str, str, str]],
+    include_better_companies: bool = True,
+    better_companies_limit: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Analyze many (ticker_symbol, start_date, end_date) windows in one call.
+
+    Items are grouped by ticker so each price series is fetched once, and the
+    stocks table is read once for the whole batch. Returns one ``{"result": ...}``
+    or ``{"error": ...}`` dict per item, in request order.
+    """
+    companies = list_companies(db) if include_better_companies else None
+
+    positions_by_ticker: Dict[str, List[int]] = {}
+    for position, (ticker_symbol, _, _) in enumerate(items):
+        positions_by_ticker.setdefault(ticker_symbol, []).append(position)
+
+    results: List[Dict] = [{} for _ in items]
+    for ticker_symbol, positions in positions_by_ticker.items():
+        series = price_store.get(db, ticker_symbol)
+        for position in positions:
+            _, start_date, end_date = items[position]
+            if include_better_companies:
+                key = analysis_cache.key(ticker_symbol, start_date, end_date, better_companies_limit, None)
+            else:
+                key = analysis_cache.key(ticker_symbol, start_date, end_date, None, None, False)
+            try:
+                start = datetime.strptime(start_date, "%Y-%m-%d").date()
+                end = datetime.strptime(end_date, "%Y-%m-%d").date()
+                results[position] = {
+                    "result": analysis_cache.get_or_compute(
+                        key,
+                        lambda: analyze_series(
+                            db, series, ticker_symbol, start, end,
+                            better_companies_limit, include_better_companies, companies,
+                        ),
+                    )
+                }
+            except (NoResultFound, ValueError) as error:
+                results[position] = {"error": str(error)}
+    return results
+
 # Query and calculate a time period
 def query_and_calculate_period(db: Session, ticker_symbol: str, reference_date: datetime.date, days: int, direction: str) -> Dict:
     """
     Query stock prices and calculate profit for periods before or after the reference date.
     """
-    if direction == "before":
-        period_start = reference_date - timedelta(days=days)
-        period_end = reference_date - timedelta(days=1)
-    else:  # direction == "after"
-        period_start = reference_date + timedelta(days=1)
-        period_end = reference_date + timedelta(days=days)
+    series = price_store.get(db, ticker_symbol)
+    return calculate_series_period_profit(series, *adjacent_period(reference_date, days, direction))
 
-    prices = db.query(StockPrice).filter(
-        StockPrice.ticker_symbol == ticker_symbol,
-        StockPrice.date >= period_start,
-        StockPrice.date <= period_end,
-    ).order_by(StockPrice.date).all()
+# Calculate maximum profit for a date range of a cached price series
+def calculate_series_period_profit(series: Optional[PriceSeries], start_date: date, end_date: date) -> Dict:
+    if series is None:
+        return {}
+
+    lo, hi = series.bounds(start_date, end_date)
+    return calculate_series_profit(series, lo, hi) if lo < hi else {}
 
-    return calculate_profit(prices) if prices else {}
+# Date bounds of the period before or after a reference date
+def adjacent_period(reference_date: datetime.date, days: int, direction: str) -> Tuple[datetime.date, datetime.date]:
+    """
+    Return the inclusive (start, end) of the ``days``-long period before or after the reference date.
+    """
+    if direction == "before":
+        return reference_date - timedelta(days=days), reference_date - timedelta(days=1)
+    # direction == "after"
+    return reference_date + timedelta(days=1), reference_date + timedelta(days=days)
 
 # Calculate maximum profit
 def calculate_profit(prices: List[StockPrice]) -> Dict:
@@ -72,24 +195,10 @@ def calculate_profit(prices: List[StockPrice]) -> Dict:
     if not prices:
         return {}
 
-    min_price = float("inf")
-    max_profit = 0
-    buy_date = None
-    sell_date = None
-
-    for price in prices:
-        if price.close_price < min_price:
-            min_price = price.close_price
-            buy_date = price.date
-
-        profit = price.close_price - min_price
-        if profit > max_profit:
-            max_profit = profit
-            sell_date = price.date
-
+    buy_index, sell_index, max_profit = kernels.max_profit([price.close_price for price in prices])
     return {
-        "buy_date": buy_date,
-        "sell_date": sell_date,
+        "buy_date": prices[buy_index].date if buy_index is not None else None,
+        "sell_date": prices[sell_index].date if sell_index is not None else None,
         "max_profit": max_profit,
     }
 
@@ -98,92 +207,488 @@ def calculate_total_profit(prices: List[StockPrice]) -> float:
     """
     Calculate the total profit for multiple buy-sell transactions.
     """
-    total_profit = 0
-    for i in range(1, len(prices)):
-        profit = prices[i].close_price - prices[i - 1].close_price
-        if profit > 0:
-            total_profit += profit
-    return total_profit
+    return round(kernels.total_profit([price.close_price for price in prices]), TOTAL_PROFIT_DECIMALS)
 
-# Analyze alternative stocks
-def get_alternative_stocks(db: Session, target_ticker: str, start_date: datetime.date, end_date: datetime.date, target_profit: float) -> List[str]:
+# Calculate maximum profit over a slice of a cached price series
+def calculate_series_profit(series: PriceSeries, lo: int, hi: int) -> Dict:
     """
-    Analyze alternative stocks that provide better profit than the target ticker.
+    Calculate the maximum profit for a single buy-sell transaction within rows [lo, hi).
     """
-    better_companies = []
-    all_stocks = db.query(Stock).all()
+    if lo >= hi:
+        return {}
+
+    buy_index, sell_index, max_profit = series.range_index().max_profit(lo, hi)
+    return {
+        "buy_date": series.date_at(buy_index) if buy_index is not None else None,
+        "sell_date": series.date_at(sell_index) if sell_index is not None else None,
+        "max_profit": max_profit,
+    }
 
-    print(f"Target Ticker: {target_ticker}, Target Profit: {target_profit}")
-    
-    for stock in all_stocks:
-        print(f"Analyzing stock: {stock.ticker_symbol}")
+# Calculate total profit over a slice of a cached price series
+def calculate_series_total_profit(series: PriceSeries, lo: int, hi: int) -> float:
+    """
+    Calculate the total profit for multiple buy-sell transactions within rows [lo, hi), in O(1).
+    """
+    return round(series.range_index().total_profit(lo, hi), TOTAL_PROFIT_DECIMALS)
 
-        if stock.ticker_symbol == target_ticker:
-            print(f"Skipping target ticker: {stock.ticker_symbol}")
+# Calculate the best k-transaction plan over a slice of a cached price series
+def calculate_series_trading_plan(
+    series: PriceSeries, lo: int, hi: int, max_transactions: int, fee: float = 0.0, cooldown: int = 0
+) -> Dict:
+    """
+    Calculate the best profit from at most ``max_transactions`` trades within rows [lo, hi), net of fees.
+    """
+    closes = series.close_price
+    profit, trades = kernels.k_transaction_profit(closes[lo:hi], max_transactions, fee, cooldown)
+    return {
+        "max_transactions": max_transactions,
+        "fee": fee,
+        "cooldown": cooldown,
+        "profit": profit,
+        "trades": [
+            {
+                "buy_date": series.date_at(lo + buy),
+                "sell_date": series.date_at(lo + sell),
+                "buy_price": float(closes[lo + buy]),
+                "sell_price": float(closes[lo + sell]),
+                "profit": float(closes[lo + sell] - closes[lo + buy]) - fee,
+            }
+            for buy, sell in trades
+        ],
+    }
+
+# Analyze alternative stocks
+def get_alternative_stocks(
+    db: Session,
+    target_ticker: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    target_profit: float,
+    limit: Optional[int] = None,
+    companies: Optional[List[Tuple[str, str]]] = None,
+    resolution: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Rank the stocks whose total profit over the period beats the target ticker.
+
+    Every ticker is evaluated in one pass over the cached price series, so the
+    cost does not grow with database round trips as the universe grows.
+    ``companies`` may be passed in to reuse one ``list_companies`` read, and
+    ``resolution`` compares coarse series as in ``analyze_stock_prices``.
+    """
+    series_by_ticker = price_store.all_series(db)
+    if companies is None:
+        companies = list_companies(db)
+    companies = [company for company in companies if company[0] != target_ticker]
+
+    profits = {}
+    for ticker_symbol, _ in companies:
+        series = series_by_ticker.get(ticker_symbol)
+        if series is None:
             continue
+        if resolution is not None:
+            series = series.coarse(resolution)
+
+        lo, hi = series.bounds(start_date, end_date)
+        if lo < hi:
+            profits[ticker_symbol] = calculate_series_total_profit(series, lo, hi)
+
+    return rank_better_companies(companies, profits, target_profit, limit)
+
+# OHLCV bars of a ticker
+def get_ohlc_bars(
+    db: Session,
+    ticker_symbol: str,
+    interval: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[Dict]:
+    """
+    Return the weekly, monthly or yearly bars of a ticker that overlap [start_date, end_date].
+    """
+    series = price_store.get(db, ticker_symbol)
+    if series is None:
+        return []
+
+    rollup = series.rollup(interval)
+    lo = 0 if start_date is None else int(np.searchsorted(rollup.last_dates, np.datetime64(start_date, "D"), side="left"))
+    hi = len(rollup) if end_date is None else int(np.searchsorted(rollup.first_dates, np.datetime64(end_date, "D"), side="right"))
+    if lo >= hi:
+        return []
+
+    columns = {
+        "period_start": rollup.period_starts[lo:hi].astype(object).tolist(),
+        "first_date": rollup.first_dates[lo:hi].astype(object).tolist(),
+        "last_date": rollup.last_dates[lo:hi].astype(object).tolist(),
+    }
+    for name in PRICE_COLUMNS:
+        values = rollup.columns[name][lo:hi].tolist()
+        # Missing prices are NaN in the store and null in responses
+        columns[name] = values if name == "volume" else [None if value != value else value for value in values]
+    return [dict(zip(columns, bar)) for bar in zip(*columns.values())]
+
+# Best fixed-length windows across all tickers
+def screen_windows(
+    db: Session,
+    window: int,
+    metric: str = "max_profit",
+    top: int = 10,
+    per_ticker: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[Dict]:
+    """
+    Rank every ``window``-row period of every stock by ``metric`` and return the best ones.
 
-        other_prices = db.query(StockPrice).filter(
-            StockPrice.ticker_symbol == stock.ticker_symbol,
-            StockPrice.date >= start_date,
-            StockPrice.date <= end_date,
-        ).order_by(StockPrice.date).all()
+    ``metric`` is "max_profit", "total_profit" or "return_pct". The ``top``
+    periods are taken overall, best first, or for each stock in turn with
+    ``per_ticker``. Only rows within [start_date, end_date] are screened. The
+    reported profits are recomputed for the returned periods with the same
+    definitions as ``analyze_stock_prices``.
+    """
+    series_by_ticker = price_store.all_series(db)
+    companies = list_companies(db)
 
-        if not other_prices:
-            print(f"No prices found for stock: {stock.ticker_symbol}")
+    slices = {}
+    for ticker_symbol, _ in companies:
+        series = series_by_ticker.get(ticker_symbol)
+        if series is None:
             continue
+        lo, hi = series.bounds(start_date or date.min, end_date or date.max)
+        if hi - lo >= window:
+            slices[ticker_symbol] = (series, lo, hi)
+
+    ranked = screener.screen(
+        {ticker_symbol: series.close_price[lo:hi] for ticker_symbol, (series, lo, hi) in slices.items()},
+        window, metric, top,
+    )
+
+    candidates = [
+        (ticker_symbol, company_name, int(start), float(value))
+        for ticker_symbol, company_name in companies
+        if ticker_symbol in ranked
+        for start, value in zip(*ranked[ticker_symbol])
+    ]
+    if not per_ticker:
+        # Ties keep the order of the companies list, then the earliest period
+        candidates = sorted(candidates, key=lambda candidate: -candidate[3])[:top]
+
+    windows = []
+    for ticker_symbol, company_name, start, value in candidates:
+        series, lo, _ = slices[ticker_symbol]
+        first, last = lo + start, lo + start + window - 1
+        entry = {
+            "ticker_symbol": ticker_symbol,
+            "company_name": company_name,
+            "start_date": series.date_at(first),
+            "end_date": series.date_at(last),
+            "value": value,
+        }
+        if metric == "max_profit":
+            profit = calculate_series_profit(series, first, last + 1)
+            entry.update(value=profit["max_profit"], buy_date=profit["buy_date"], sell_date=profit["sell_date"])
+        elif metric == "total_profit":
+            entry["value"] = calculate_series_total_profit(series, first, last + 1)
+        windows.append(entry)
+    return windows
+
+# Correlation of daily returns across tickers
+def get_return_correlations(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    tickers: Optional[List[str]] = None,
+    min_periods: int = 2,
+) -> Dict:
+    """
+    Pairwise covariance and correlation of daily log close-to-close returns within [start_date, end_date].
+
+    Every ticker (or only ``tickers``) with prices in the window is aligned on
+    the union of their trading days. A return is missing when either of its
+    two days has no close, so a stock listed mid-window, or one with gaps, is
+    compared with others on the days they share. Tickers are listed in the
+    order of the stocks table; NaN statistics become None.
+    """
+    series_by_ticker = price_store.all_series(db)
+    selected = [
+        ticker_symbol for ticker_symbol, _ in list_companies(db)
+        if ticker_symbol in series_by_ticker and (tickers is None or ticker_symbol in tickers)
+    ]
+
+    windows = {}
+    for ticker_symbol in selected:
+        series = series_by_ticker[ticker_symbol]
+        lo, hi = series.bounds(start_date, end_date)
+        if lo < hi:
+            windows[ticker_symbol] = (series.dates[lo:hi], series.close_price[lo:hi])
+
+    calendar = np.unique(np.concatenate([dates for dates, _ in windows.values()])) if windows else np.empty(0, dtype="datetime64[D]")
+    closes = np.full((len(calendar), len(windows)), np.nan)
+    for column, (dates, values) in enumerate(windows.values()):
+        closes[np.searchsorted(calendar, dates), column] = values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.log(closes[1:] / closes[:-1])
+    returns[~np.isfinite(returns)] = np.nan
+
+    observations, covariance, correlation = kernels.pairwise_return_stats(returns, min_periods, CORRELATION_BLOCK_SIZE)
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "tickers": list(windows),
+        "observations": observations.tolist(),
+        "covariance": [[None if value != value else value for value in row] for row in covariance.tolist()],
+        "correlation": [[None if value != value else value for value in row] for row in correlation.tolist()],
+    }
 
-        other_profit = calculate_total_profit(other_prices)
-        print(f"Profit for {stock.ticker_symbol}: {other_profit}")
+# Indicator series of a ticker
+def get_indicator(
+    db: Session,
+    ticker_symbol: str,
+    name: str,
+    window: int = 20,
+    field: str = "close_price",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[Dict]:
+    """
+    Return the "sma", "ema", "volatility" or "drawdown" points of a ticker within [start_date, end_date].
+
+    SMA and EMA average the last ``window`` prices, the EMA being seeded with the
+    first SMA. Volatility is the sample standard deviation of the last ``window``
+    daily log returns. Drawdown is the fall from the highest price so far, as a
+    fraction of it, and takes no window. Indicators are computed over the whole
+    history, so values near ``start_date`` do not depend on the range.
+    """
+    series = price_store.get(db, ticker_symbol)
+    if series is None:
+        return []
+
+    if name == "drawdown":
+        window = 0
+    lo, hi = series.bounds(start_date or date.min, end_date or date.max)
+    rows, values = series.indicator(name, window, field, lo, hi)
+    # ISO strings rather than date objects, so long series encode without a per-point callback
+    dates = np.datetime_as_string(series.dates[rows], unit="D").tolist()
+    return [{"date": day, "value": value} for day, value in zip(dates, values)]
+
+# List (ticker_symbol, company_name) of every stock
+def list_companies(db: Session) -> List[Tuple[str, str]]:
+    return [tuple(row) for row in db.query(Stock.ticker_symbol, Stock.company_name).order_by(Stock.id).all()]
+
+# Rank companies that beat a target profit
+def rank_better_companies(
+    companies: List[Tuple[str, str]],
+    profits: Dict[str, float],
+    target_profit: float,
+    limit: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Rank (ticker_symbol, company_name) pairs whose profit beats the target, most profitable first.
+    """
+    better_companies = [
+        {"company_name": company_name, "ticker_symbol": ticker_symbol, "total_profit": profits[ticker_symbol]}
+        for ticker_symbol, company_name in companies
+        if ticker_symbol in profits and profits[ticker_symbol] > target_profit
+    ]
+
+    # Ties keep the order of the companies list
+    better_companies.sort(key=lambda company: company["total_profit"], reverse=True)
+    return better_companies[:limit] if limit is not None else better_companies
+
+
+# Keep derived state in step with writes
+def stock_changed(ticker_symbol: str) -> None:
+    """
+    Invalidate cached results that depend on the stock row of ``ticker_symbol``.
+    """
+    if price_store.loaded:
+        series = price_store.peek(ticker_symbol)
+        price_span = (series.date_at(0), series.date_at(len(series) - 1)) if series is not None else None
+    else:
+        price_span = (date.min, date.max)
+    analysis_cache.invalidate_stock(ticker_symbol, price_span)
+
+def price_changed(stock_price: StockPrice) -> None:
+    """
+    Record a new price row in the price store and invalidate results it affects.
+    """
+    price_store.add(stock_price)
+    analysis_cache.invalidate_prices(stock_price.ticker_symbol, stock_price.date)
 
-        if other_profit > target_profit:
-            print(f"Adding {stock.company_name} to better companies list.")
-            better_companies.append(stock.company_name)
+def prices_upserted(rows: List[Dict]) -> None:
+    """
+    Merge a batch of written price rows into the price store and invalidate results they affect.
+    """
+    rows_by_ticker: Dict[str, List[Dict]] = {}
+    for row in rows:
+        rows_by_ticker.setdefault(row["ticker_symbol"], []).append(row)
+
+    for ticker_symbol, ticker_rows in rows_by_ticker.items():
+        ticker_rows.sort(key=lambda row: row["date"])
+        days = np.array([row["date"] for row in ticker_rows], dtype="datetime64[D]")
+        columns = {}
+        for name in PRICE_COLUMNS:
+            values = [row[name] for row in ticker_rows]
+            if name == "volume":
+                columns[name] = np.array([0 if value is None else value for value in values], dtype=np.int64)
+            else:
+                columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        price_store.merge(ticker_symbol, days, columns)
+        analysis_cache.invalidate_prices(ticker_symbol, ticker_rows[0]["date"], ticker_rows[-1]["date"])
+
+def prices_reset() -> None:
+    """
+    Drop everything derived from stock_prices after a bulk change.
+    """
+    price_store.reset()
+    analysis_cache.clear()
 
-    # Debug: Ensure Amazon is always included for testing
-    better_companies.append("Amazon (Test Entry)")
+def data_changed_elsewhere(names: List[str]) -> None:
+    """
+    Drop state derived from data versions moved by another process: the
+    tickers whose prices were written and every cached analysis.
+    """
+    price_store.invalidate(
+        name[len(TICKER_PRICES_PREFIX):] for name in names if name.startswith(TICKER_PRICES_PREFIX)
+    )
+    analysis_cache.clear()
 
-    print(f"Better Companies: {better_companies}")
-    return better_companies
+data_versions.add_listener(data_changed_elsewhere)
 
 
 # CRUD Operations for Stocks
 def create_stock(db: Session, stock: Stock) -> Stock:
     db.add(stock)
+    bump_versions(db, [STOCKS])
     db.commit()
     db.refresh(stock)
+    stock_changed(stock.ticker_symbol)
     return stock
 
 def get_stock_by_id(db: Session, stock_id: int) -> Optional[Stock]:
     return db.query(Stock).filter(Stock.id == stock_id).first()
 
+def get_stock_by_ticker(db: Session, ticker_symbol: str) -> Optional[Stock]:
+    return db.query(Stock).filter(Stock.ticker_symbol == ticker_symbol).first()
+
 def get_all_stocks(db: Session) -> List[Stock]:
     return db.query(Stock).all()
 
+def get_all_stock_rows(db: Session) -> List[Dict]:
+    """
+    Return every stock as a plain dict with the fields of the ``Stock`` schema, in its field order.
+    """
+    fields = tuple(schemas.Stock.model_fields)
+    return [dict(zip(fields, row)) for row in db.query(*(getattr(Stock, field) for field in fields)).all()]
+
 def update_stock(db: Session, stock_id: int, stock_data: dict) -> Optional[Stock]:
     stock = db.query(Stock).filter(Stock.id == stock_id).first()
     if stock:
+        old_ticker_symbol = stock.ticker_symbol
         for key, value in stock_data.items():
             setattr(stock, key, value)
+        bump_versions(db, [STOCKS])
         db.commit()
         db.refresh(stock)
+        stock_changed(old_ticker_symbol)
+        if stock.ticker_symbol != old_ticker_symbol:
+            stock_changed(stock.ticker_symbol)
     return stock
 
 def delete_stock(db: Session, stock_id: int) -> None:
     stock = db.query(Stock).filter(Stock.id == stock_id).first()
     if stock:
         db.delete(stock)
+        bump_versions(db, [STOCKS])
         db.commit()
+        stock_changed(stock.ticker_symbol)
 
 # CRUD Operations for Stock Prices
 def create_stock_price(db: Session, stock_price: StockPrice) -> StockPrice:
     db.add(stock_price)
+    bump_versions(db, price_version_names([stock_price.ticker_symbol]))
     db.commit()
     db.refresh(stock_price)
+    price_changed(stock_price)
     return stock_price
 
+def upsert_stock_prices(db: Session, rows: List[Dict]) -> Tuple[int, int, int]:
+    """
+    Insert or replace price rows keyed on (ticker_symbol, date) in one transaction.
+
+    The rows go out as a single executemany of the dialect's upsert, which the
+    MySQL driver rewrites into multi-row INSERTs. A key repeated within the
+    batch keeps its last row; the earlier ones are superseded and never written.
+    Returns (inserted, updated, superseded).
+    """
+    received = len(rows)
+    rows = list({(row["ticker_symbol"], row["date"]): row for row in rows}.values())
+    superseded = received - len(rows)
+    if not rows:
+        return 0, 0, superseded
+
+    dates = [row["date"] for row in rows]
+    existing = {
+        tuple(key)
+        for key in db.execute(
+            existing_price_keys_query({row["ticker_symbol"] for row in rows}, min(dates), max(dates))
+        )
+    }
+    updated = sum((row["ticker_symbol"], row["date"]) in existing for row in rows)
+
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+    else:
+        # Portable fallback: update the rows that exist, insert the rest
+        updates = [row for row in rows if (row["ticker_symbol"], row["date"]) in existing]
+        if updates:
+            db.execute(
+                update(StockPrice).where(
+                    StockPrice.ticker_symbol == bindparam("key_ticker_symbol"),
+                    StockPrice.date == bindparam("key_date"),
+                ),
+                [
+                    {**{name: row[name] for name in PRICE_COLUMNS}, "key_ticker_symbol": row["ticker_symbol"], "key_date": row["date"]}
+                    for row in updates
+                ],
+            )
+        inserts = [row for row in rows if (row["ticker_symbol"], row["date"]) not in existing]
+        if inserts:
+            db.execute(insert(StockPrice), inserts)
+    bump_versions(db, price_version_names({row["ticker_symbol"] for row in rows}))
+    db.commit()
+    prices_upserted(rows)
+    return len(rows) - updated, updated, superseded
+
+def existing_price_keys_query(ticker_symbols, start_date: date, end_date: date) -> Select:
+    """
+    Select the (ticker_symbol, date) keys stored for ``ticker_symbols`` within a date range.
+    """
+    return select(StockPrice.ticker_symbol, StockPrice.date).where(
+        StockPrice.ticker_symbol.in_(ticker_symbols),
+        StockPrice.date.between(start_date, end_date),
+    )
+
+def _upsert_statement(dialect_name: str):
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect_name == "sqlite" else postgresql.insert)(StockPrice)
+        return stmt.on_conflict_do_update(
+            index_elements=[StockPrice.ticker_symbol, StockPrice.date],
+            set_={name: stmt.excluded[name] for name in PRICE_COLUMNS},
+        )
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql.insert(StockPrice)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in PRICE_COLUMNS})
+    return None
+
 def get_stock_prices_by_ticker(db: Session, ticker_symbol: str) -> List[StockPrice]:
     return db.query(StockPrice).filter(StockPrice.ticker_symbol == ticker_symbol).all()
 
 def delete_all_stock_prices(db: Session) -> None:
     db.query(StockPrice).delete()
+    # Forget ingested files so the next init_db loads them again
+    db.query(IngestedFile).delete()
+    bump_all_price_versions(db)
     db.commit()
+    prices_reset()
@@ -1,11 +1,4 @@
-from fastapi import Depends
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+# Database session dependencies live in app.database; re-exported for route modules
+from app.database import get_async_db, get_db, get_read_db, get_write_db
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+__all__ = ["get_db", "get_read_db", "get_write_db", "get_async_db"]
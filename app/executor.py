@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from app.metrics import LATENCY_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+QUEUE_WAIT = Histogram(
+    "analysis_queue_wait_seconds", "Time heavy analysis jobs wait for a worker.", LATENCY_BUCKETS
+)
+
+
+class ExecutorOverloaded(Exception):
+    """
+    The analysis queue is full; the request is shed instead of queued.
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    An analysis job did not finish within its deadline.
+    """
+
+
+class _Job:
+    """
+    Bookkeeping of one submitted job: the single outcome it is counted under.
+    """
+
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome: Optional[str] = None
+
+
+class AnalysisExecutor:
+    """
+    Bounded worker pool for CPU- and database-heavy analysis, kept apart from
+    the threadpool that serves cheap routes.
+
+    At most ``workers`` jobs run at once and at most ``queue_limit`` more wait;
+    further submissions raise ``ExecutorOverloaded`` straight away. A caller
+    waits at most ``deadline_seconds`` (queueing included) before
+    ``DeadlineExceeded``; a job still queued by then is dropped, one already
+    running finishes in the background and its result is discarded. Every job
+    is counted once, as completed, failed or timed out, whichever is known first.
+
+    Threads rather than processes: jobs read the shared in-memory price store
+    and the heavy parts are NumPy kernels that release the GIL.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, deadline_seconds: float):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.deadline_seconds = deadline_seconds
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._started = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+        self._wait_seconds = 0.0
+
+    def _record(self, job: _Job, outcome: str) -> None:
+        # Caller holds the lock
+        if job.outcome is None:
+            job.outcome = outcome
+            self._counters[outcome] += 1
+
+    def _execute(self, job: _Job, enqueued_at: float, context: contextvars.Context, call: Callable[[], T]) -> T:
+        waited = time.perf_counter() - enqueued_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            self._wait_seconds += waited
+        QUEUE_WAIT.observe(waited)
+        try:
+            result = context.run(call)
+        except BaseException:
+            with self._lock:
+                self._record(job, "failed")
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+        with self._lock:
+            self._record(job, "completed")
+        return result
+
+    def _dequeue_cancelled(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _submit(self, func: Callable[..., T], *args, **kwargs) -> Tuple[Future, _Job]:
+        with self._lock:
+            if self._queued + self._running >= self.workers + self.queue_limit:
+                self._counters["rejected"] += 1
+                raise ExecutorOverloaded(f"Analysis queue is full ({self.queue_limit} waiting)")
+            self._queued += 1
+            self._counters["submitted"] += 1
+
+        # Context is copied so per-request state such as query metrics follows the job
+        job = _Job()
+        future = self._pool.submit(
+            self._execute, job, time.perf_counter(), contextvars.copy_context(), partial(func, *args, **kwargs)
+        )
+        future.add_done_callback(self._dequeue_cancelled)
+        return future, job
+
+    def submit(self, func: Callable[..., T], *args, **kwargs) -> Future:
+        """
+        Queue ``func(*args, **kwargs)`` in the caller's context, or raise ``ExecutorOverloaded``.
+        """
+        return self._submit(func, *args, **kwargs)[0]
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run ``func(*args, **kwargs)`` on the pool and await its result within the deadline.
+        """
+        future, job = self._submit(func, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.deadline_seconds)
+        except asyncio.TimeoutError:
+            # Cancelling only succeeds while the job is still queued
+            future.cancel()
+            with self._lock:
+                self._record(job, "timed_out")
+            logger.warning("analysis job exceeded deadline seconds=%.1f", self.deadline_seconds)
+            raise DeadlineExceeded(f"Analysis did not finish within {self.deadline_seconds:g} seconds")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "queued": self._queued,
+                "running": self._running,
+                "mean_wait_seconds": self._wait_seconds / self._started if self._started else 0.0,
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "deadline_seconds": self.deadline_seconds,
+            }
+
+
+# Shared pool for heavy analysis routes; sized by ANALYSIS_WORKERS, ANALYSIS_QUEUE_LIMIT and ANALYSIS_DEADLINE_SECONDS
+analysis_executor = AnalysisExecutor(
+    workers=int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1))),
+    queue_limit=int(os.getenv("ANALYSIS_QUEUE_LIMIT", "64")),
+    deadline_seconds=float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "30")),
+)
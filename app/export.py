@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Select
+
+from app.models import StockPrice
+
+# Columns a price export may contain, in default order
+EXPORT_COLUMNS = ("date", "open_price", "high_price", "low_price", "close_price", "adj_close_price", "volume")
+
+# Rows fetched from the server-side cursor and written per chunk
+EXPORT_CHUNK_SIZE = 5000
+
+# Response media type of each export format
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated column list, raising ValueError on unknown names.
+    """
+    if not columns:
+        return list(EXPORT_COLUMNS)
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}. Choose from {', '.join(EXPORT_COLUMNS)}.")
+    return selected
+
+
+def price_rows_query(
+    ticker_symbol: str, columns: Sequence[str], start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> Select:
+    """
+    Select ``columns`` of one ticker's rows, optionally within a date range, in date order.
+    """
+    stmt = select(*(getattr(StockPrice, column) for column in columns)).where(
+        StockPrice.ticker_symbol == ticker_symbol
+    )
+    if start_date is not None:
+        stmt = stmt.where(StockPrice.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(StockPrice.date <= end_date)
+    return stmt.order_by(StockPrice.date)
+
+
+def iter_price_rows(
+    db: Session,
+    ticker_symbol: str,
+    columns: Sequence[str],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Sequence]:
+    """
+    Yield lists of up to ``chunk_size`` row tuples of one ticker, ordered by date.
+
+    ``yield_per`` makes the driver stream from a server-side cursor, so only one
+    chunk is held in memory at a time.
+    """
+    stmt = price_rows_query(ticker_symbol, columns, start_date, end_date).execution_options(yield_per=chunk_size)
+    for partition in db.execute(stmt).partitions():
+        yield partition
+
+
+def format_csv(columns: Sequence[str], chunks: Iterator[Sequence]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_ndjson(columns: Sequence[str], chunks: Iterator[Sequence]) -> Iterator[str]:
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=date.isoformat) + "\n" for row in rows)
+
+
+def stream_export(
+    session_factory: sessionmaker,
+    ticker_symbol: str,
+    columns: Sequence[str],
+    export_format: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    Generate the body of a price export chunk by chunk.
+
+    The generator owns its session, so the cursor stays open for exactly as long
+    as the response is being sent and is closed even if the client disconnects.
+    """
+    formatter = format_ndjson if export_format == "ndjson" else format_csv
+    db = session_factory()
+    try:
+        yield from formatter(columns, iter_price_rows(db, ticker_symbol, columns, start_date, end_date, chunk_size))
+    finally:
+        db.close()
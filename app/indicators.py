@@ -0,0 +1,160 @@
+import os
+import math
+import bisect
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Supported indicators and the price columns they can be computed over
+INDICATORS = ("sma", "ema", "volatility", "drawdown")
+INDICATOR_FIELDS = ("close_price", "adj_close_price")
+
+# Indicator series kept per ticker, least recently used evicted first
+INDICATORS_PER_TICKER = int(os.getenv("INDICATORS_PER_TICKER", "32"))
+
+
+class _MovingAverage:
+    # Running sum over the last ``window`` prices
+    def __init__(self, window: int):
+        self.window = window
+        self.recent = deque()
+        self.total = 0.0
+
+    def update(self, price: float) -> Optional[float]:
+        self.recent.append(price)
+        self.total += price
+        if len(self.recent) > self.window:
+            self.total -= self.recent.popleft()
+        return self.total / self.window if len(self.recent) == self.window else None
+
+
+class _ExponentialAverage:
+    # Seeded with the simple average of the first ``window`` prices
+    def __init__(self, window: int):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, price: float) -> Optional[float]:
+        self.count += 1
+        if self.count < self.window:
+            self.value += price
+            return None
+        if self.count == self.window:
+            self.value = (self.value + price) / self.window
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+
+class _Volatility:
+    # Sliding-window Welford variance of daily log returns
+    def __init__(self, window: int):
+        self.window = window
+        self.previous = None
+        self.recent = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, price: float) -> Optional[float]:
+        previous, self.previous = self.previous, price
+        if previous is None:
+            return None
+
+        value = math.log(price / previous)
+        self.recent.append(value)
+        if len(self.recent) <= self.window:
+            delta = value - self.mean
+            self.mean += delta / len(self.recent)
+            self.m2 += delta * (value - self.mean)
+        else:
+            # Replace the oldest return in one step, keeping the count fixed
+            oldest = self.recent.popleft()
+            mean = self.mean + (value - oldest) / self.window
+            self.m2 = max(0.0, self.m2 + (value - oldest) * (value - mean + oldest - self.mean))
+            self.mean = mean
+        return math.sqrt(self.m2 / (self.window - 1)) if len(self.recent) == self.window else None
+
+
+class _Drawdown:
+    # Fall from the running peak, as a fraction of the peak
+    def __init__(self, window: int):
+        self.peak = 0.0
+
+    def update(self, price: float) -> Optional[float]:
+        self.peak = max(self.peak, price)
+        return price / self.peak - 1.0
+
+
+_STATES = {"sma": _MovingAverage, "ema": _ExponentialAverage, "volatility": _Volatility, "drawdown": _Drawdown}
+
+
+class Indicator:
+    """
+    Values of one indicator over the first ``rows`` rows of a price column.
+
+    Every price is folded into a constant-size running state, so rows appended
+    to the series are taken in with O(1) work each. Rows whose price is missing
+    or not positive are skipped; ``positions`` holds the row of every value.
+    """
+
+    def __init__(self, name: str, window: int):
+        self.rows = 0
+        self.positions: List[int] = []
+        self.values: List[float] = []
+        self._state = _STATES[name](window)
+
+    def extend(self, column: np.ndarray) -> None:
+        update = self._state.update
+        for position, price in enumerate(column[self.rows :].tolist(), start=self.rows):
+            if not price > 0:
+                continue
+            value = update(price)
+            if value is not None:
+                self.positions.append(position)
+                self.values.append(value)
+        self.rows = len(column)
+
+    def points(self, lo: int, hi: int) -> Tuple[List[int], List[float]]:
+        """
+        Return the (rows, values) of the points within rows [lo, hi).
+        """
+        first = bisect.bisect_left(self.positions, lo)
+        last = bisect.bisect_left(self.positions, hi)
+        return self.positions[first:last], self.values[first:last]
+
+
+class IndicatorSlot:
+    """
+    Indicator series shared by every PriceSeries published from the same rows,
+    keyed by (indicator, window, field). Series that have grown since the last
+    request are caught up with ``Indicator.extend``.
+    """
+
+    def __init__(self, capacity: int = INDICATORS_PER_TICKER):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._indicators: "OrderedDict[Tuple, Indicator]" = OrderedDict()
+
+    def points(
+        self, name: str, window: int, field: str, column: np.ndarray, lo: int, hi: int
+    ) -> Tuple[List[int], List[float]]:
+        key = (name, window, field)
+        with self._lock:
+            indicator = self._indicators.get(key)
+            if indicator is None or indicator.rows > len(column):
+                fresh = Indicator(name, window)
+                fresh.extend(column)
+                if indicator is not None:
+                    # An older, shorter snapshot of the series; not worth caching
+                    return fresh.points(lo, hi)
+                indicator = self._indicators[key] = fresh
+                while len(self._indicators) > self.capacity:
+                    self._indicators.popitem(last=False)
+            elif indicator.rows < len(column):
+                indicator.extend(column)
+            self._indicators.move_to_end(key)
+            return indicator.points(lo, hi)
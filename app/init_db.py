@@ -1,29 +1,128 @@
 import os
 import csv
-from sqlalchemy.orm import Session
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Select
 from app.database import SessionLocal, engine
-from app.models import Base, Stock, StockPrice
-from datetime import datetime
+from app.models import Base, IngestedFile, Stock, StockPrice
+from app.migrations import migrate_stock_price_index
+from app.crud import prices_reset, stock_changed
+from app.price_store import price_store
+from app.snapshot import build_from_db, snapshot_matches
+from app.versions import STOCKS, bump_versions, price_version_names
+from datetime import date, datetime
 
+logger = logging.getLogger(__name__)
+
+# Number of CSV rows parsed and inserted per batch
+DEFAULT_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "5000"))
+
+# CSV columns after the date, in file order
+CSV_PRICE_COLUMNS = ("open_price", "high_price", "low_price", "close_price", "adj_close_price", "volume")
+
+# Lock file serializing init_db across worker processes on one host
+INIT_LOCK_FILE = os.getenv("INIT_DB_LOCK_FILE", os.path.join(tempfile.gettempdir(), "stock-api-init-db.lock"))
+
+# Progress of the last init_db run in this process, reported by the /ready endpoint
+init_status = {"state": "pending", "started_at": None, "finished_at": None, "error": None}
 
-# Initialize the database
-def init_db():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
 
-    # Initialize session
-    db = SessionLocal()
+# Initialize the database
+def init_db(
+    csv_directory_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+):
+    init_status.update(state="running", started_at=datetime.now(), finished_at=None, error=None)
     try:
-        # Add initial stock data
-        initialize_stocks(db)
+        # Only one process initializes at a time; the others then find every file unchanged
+        with init_lock():
+            # Create all tables and upgrade ones created by older versions
+            Base.metadata.create_all(bind=engine)
+            migrate_stock_price_index(engine)
 
-        # Import stock prices from CSV
-        csv_directory_path = os.getenv("CSV_DIRECTORY_PATH", "./data")
-        load_csv_files(db, csv_directory_path)
+            # Initialize session
+            db = SessionLocal()
+            try:
+                # Add initial stock data
+                initialize_stocks(db)
 
-        print("Database initialization completed successfully.")
-    finally:
-        db.close()
+                # Import stock prices from CSV
+                if csv_directory_path is None:
+                    csv_directory_path = os.getenv("CSV_DIRECTORY_PATH", "./data")
+                reports = load_csv_files(db, csv_directory_path, workers, chunk_size)
+
+                # Prices may have changed underneath any cached series or results, also when
+                # another process ingested them while this one waited for the lock
+                inserted = any(report["inserted"] for report in reports)
+                prices_reset()
+
+                # Publish a new mapped snapshot for the workers that serve from one
+                snapshot_dir = price_store.snapshot_dir
+                if snapshot_dir and (inserted or not snapshot_matches(snapshot_dir, db)):
+                    logger.info("built price snapshot version=%s dir=%s", build_from_db(db, snapshot_dir), snapshot_dir)
+
+                logger.info("database initialization completed")
+            finally:
+                db.close()
+    except Exception as error:
+        init_status.update(state="failed", finished_at=datetime.now(), error=str(error))
+        raise
+    init_status.update(state="ready", finished_at=datetime.now())
+
+
+def start_init_db_in_background(**kwargs) -> threading.Thread:
+    """
+    Run init_db on a daemon thread so the server can accept requests while it warms up.
+    """
+    def run():
+        try:
+            init_db(**kwargs)
+        except Exception:
+            # Recorded in init_status; logged here because the thread has no caller to raise to
+            logger.exception("database initialization failed")
+
+    init_status.update(state="running", started_at=datetime.now())
+    thread = threading.Thread(target=run, name="init-db", daemon=True)
+    thread.start()
+    return thread
+
+
+@contextmanager
+def init_lock(path: str = INIT_LOCK_FILE):
+    """
+    Hold an exclusive cross-process file lock, waiting for any current holder.
+
+    The lock only covers processes on one host; without fcntl (Windows) it is a no-op.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 def initialize_stocks(db: Session):
@@ -38,6 +137,7 @@ def initialize_stocks(db: Session):
         {"company_name": "Netflix, Inc.", "ticker_symbol": "NFLX", "date_founded": "1997-08-29", "industry": "Streaming"},
     ]
 
+    added = []
     for stock_data in stocks:
         if not db.query(Stock).filter_by(ticker_symbol=stock_data["ticker_symbol"]).first():
             stock = Stock(
@@ -47,34 +147,138 @@ def initialize_stocks(db: Session):
                 industry=stock_data["industry"],
             )
             db.add(stock)
+            added.append(stock.ticker_symbol)
+    if added:
+        bump_versions(db, [STOCKS])
     db.commit()
-    print("Initial stock data added.")
+    for ticker_symbol in added:
+        stock_changed(ticker_symbol)
+    logger.info("initial stock data added")
 
 
-def load_csv_files(db: Session, directory_path: str):
+def load_csv_files(
+    db: Session,
+    directory_path: str,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> List[Dict]:
     """
     Load stock prices from CSV files in the given directory.
+
+    Files recorded in the ingest manifest with the same size and mtime, or the
+    same content hash, are skipped. The rest are ingested concurrently by a
+    process pool of ``workers`` processes (``INIT_DB_WORKERS``, defaulting to
+    one per CPU). Returns one report per ingested file.
     """
     if not os.path.exists(directory_path) or not os.path.isdir(directory_path):
-        print(f"CSV directory does not exist or is not a directory: {directory_path}")
-        return
+        logger.warning("CSV directory does not exist or is not a directory: %s", directory_path)
+        return []
 
-    for filename in os.listdir(directory_path):
+    jobs = []
+    fingerprints = []
+    for filename in sorted(os.listdir(directory_path)):
         if filename.endswith(".csv"):
-            process_csv_file(db, os.path.join(directory_path, filename))
+            file_path = os.path.join(directory_path, filename)
+            stock = find_stock_for_file(db, file_path)
+            if not stock:
+                continue
+
+            unchanged, fingerprint = check_ingested_file(db, file_path, stock.ticker_symbol)
+            if unchanged:
+                logger.info("skipping unchanged file=%s ticker=%s", file_path, stock.ticker_symbol)
+                continue
+            jobs.append((file_path, stock.ticker_symbol, chunk_size))
+            fingerprints.append(fingerprint)
+
+    if not jobs:
+        return []
+
+    if workers is None:
+        workers = int(os.getenv("INIT_DB_WORKERS", "0")) or os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
 
+    if workers == 1:
+        reports = [ingest_csv_file(db, *job) for job in jobs]
+    else:
+        # Workers are spawned rather than forked so they never inherit pooled connections
+        database_url = engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(database_url,),
+        ) as executor:
+            reports = list(executor.map(_ingest_in_worker, jobs))
 
-def process_csv_file(db: Session, file_path: str):
+    for report, fingerprint in zip(reports, fingerprints):
+        record_ingested_file(db, fingerprint, report)
+        log_report(report)
+    return reports
+
+
+def file_fingerprint(file_path: str, content_hash: Optional[str] = None) -> Dict:
     """
-    Process a single CSV file and load its data into the database.
+    Return the manifest fields identifying a file: absolute path, size, mtime and,
+    if given, its content hash.
     """
-    print(f"Processing file: {file_path}")
+    path = os.path.realpath(file_path)
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, "content_hash": content_hash}
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Extract the base name of the file (e.g., "apple" from "apple.csv")
-    company_name_fragment = os.path.splitext(os.path.basename(file_path))[0].lower()
-    print(f"Detected company name fragment: {company_name_fragment}")
 
-    # Find the matching stock by company name
+def check_ingested_file(db: Session, file_path: str, ticker_symbol: str) -> Tuple[bool, Dict]:
+    """
+    Compare a CSV file with its manifest entry and return (unchanged, fingerprint).
+
+    Matching size and mtime are trusted without reading the file. Otherwise the
+    content hash decides, and a file that was only touched has its manifest
+    entry refreshed so the next check is a stat again.
+    """
+    fingerprint = file_fingerprint(file_path)
+    entry = db.query(IngestedFile).filter(IngestedFile.path == fingerprint["path"]).first()
+    if entry is not None and entry.ticker_symbol == ticker_symbol:
+        if entry.size == fingerprint["size"] and entry.mtime == fingerprint["mtime"]:
+            return True, fingerprint
+
+    fingerprint["content_hash"] = hash_file(fingerprint["path"])
+    if entry is not None and entry.ticker_symbol == ticker_symbol and entry.content_hash == fingerprint["content_hash"]:
+        entry.size = fingerprint["size"]
+        entry.mtime = fingerprint["mtime"]
+        db.commit()
+        return True, fingerprint
+    return False, fingerprint
+
+
+def record_ingested_file(db: Session, fingerprint: Dict, report: Dict):
+    """
+    Create or update the manifest entry of a file after it has been ingested.
+    """
+    entry = db.query(IngestedFile).filter(IngestedFile.path == fingerprint["path"]).first()
+    if entry is None:
+        entry = IngestedFile(path=fingerprint["path"])
+        db.add(entry)
+    entry.ticker_symbol = report["ticker_symbol"]
+    entry.size = fingerprint["size"]
+    entry.mtime = fingerprint["mtime"]
+    entry.content_hash = fingerprint["content_hash"]
+    entry.row_count = report["rows"]
+    entry.ingested_at = datetime.now()
+    db.commit()
+
+
+def find_stock_for_file(db: Session, file_path: str) -> Optional[Stock]:
+    """
+    Find the stock a CSV file belongs to from its file name (e.g. "apple" from "apple.csv").
+    """
+    company_name_fragment = os.path.splitext(os.path.basename(file_path))[0].lower()
     stock = (
         db.query(Stock)
         .filter(Stock.company_name.ilike(f"%{company_name_fragment}%"))
@@ -82,46 +286,156 @@ def process_csv_file(db: Session, file_path: str):
     )
 
     if not stock:
-        print(f"No stock found for company name containing '{company_name_fragment}'. Skipping file.")
-        return
+        logger.warning("no stock found for company name containing %r, skipping file=%s", company_name_fragment, file_path)
+    return stock
+
 
-    ticker_symbol = stock.ticker_symbol
-    print(f"Found stock: {stock.company_name} (Ticker: {ticker_symbol})")
+def process_csv_file(db: Session, file_path: str) -> Optional[Dict]:
+    """
+    Process a single CSV file and load its data into the database.
+    """
+    stock = find_stock_for_file(db, file_path)
+    if not stock:
+        return None
+
+    report = ingest_csv_file(db, file_path, stock.ticker_symbol)
+    log_report(report)
+    return report
+
+
+def stored_dates_query(ticker_symbol: str) -> Select:
+    """
+    Select the dates already stored for one ticker.
+    """
+    return select(StockPrice.date).where(StockPrice.ticker_symbol == ticker_symbol)
 
-    with open(file_path, mode="r") as csv_file:
+
+def ingest_csv_file(
+    db: Session, file_path: str, ticker_symbol: str, chunk_size: Optional[int] = None
+) -> Dict:
+    """
+    Bulk load one CSV file of daily prices for ``ticker_symbol``.
+
+    Rows are read in chunks, parsed column-wise, deduplicated against the dates
+    already stored for the ticker (one query up front) and written with a single
+    executemany per chunk. Re-running on the same file inserts nothing.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    started = time.perf_counter()
+    existing_dates: Set[date] = set(
+        db.execute(stored_dates_query(ticker_symbol)).scalars()
+    )
+    report = {"file": file_path, "ticker_symbol": ticker_symbol, "rows": 0, "inserted": 0, "skipped": 0, "errors": 0}
+
+    with open(file_path, mode="r", newline="") as csv_file:
         csv_reader = csv.reader(csv_file)
-        next(csv_reader)  # Skip header row
-        for row in csv_reader:
-            try:
-                date = datetime.strptime(row[0].strip(), "%Y-%m-%d").date()
-                open_price = float(row[1].strip())
-                high_price = float(row[2].strip())
-                low_price = float(row[3].strip())
-                close_price = float(row[4].strip())
-                adj_close_price = float(row[5].strip())
-                volume = int(row[6].strip())
-
-                # Check if the record already exists
-                if not db.query(StockPrice).filter_by(ticker_symbol=ticker_symbol, date=date).first():
-                    stock_price = StockPrice(
-                        ticker_symbol=ticker_symbol,
-                        date=date,
-                        open_price=open_price,
-                        high_price=high_price,
-                        low_price=low_price,
-                        close_price=close_price,
-                        adj_close_price=adj_close_price,
-                        volume=volume,
-                    )
-                    db.add(stock_price)
-                else:
-                    print(f"Duplicate entry found for {ticker_symbol} on {date}. Skipping.")
-            except Exception as e:
-                print(f"Error processing line in file {file_path}: {row}. Error: {e}")
-    db.commit()
-    print(f"Finished processing file: {file_path}")
+        next(csv_reader, None)  # Skip header row
+        while True:
+            chunk = list(islice(csv_reader, chunk_size))
+            if not chunk:
+                break
+
+            parsed, errors = parse_price_rows(chunk)
+            report["rows"] += len(chunk)
+            report["errors"] += errors
+
+            new_rows = []
+            for row in parsed:
+                if row["date"] in existing_dates:
+                    report["skipped"] += 1
+                    continue
+                existing_dates.add(row["date"])
+                row["ticker_symbol"] = ticker_symbol
+                new_rows.append(row)
+
+            if new_rows:
+                db.execute(insert(StockPrice), new_rows)
+                bump_versions(db, price_version_names([ticker_symbol]))
+                db.commit()
+                report["inserted"] += len(new_rows)
+
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] > 0 else 0.0
+    return report
+
+
+def parse_price_rows(rows: List[List[str]]) -> Tuple[List[Dict], int]:
+    """
+    Parse a chunk of CSV rows into StockPrice column dicts.
+
+    The whole chunk is converted column by column with NumPy. If any value is
+    malformed the chunk falls back to row-by-row parsing so that only the bad
+    rows are dropped. Returns the parsed rows and the number of rejected rows.
+    """
+    try:
+        if any(len(row) < 7 for row in rows):
+            raise ValueError("short row")
+        columns = list(zip(*rows))
+        days = [value.strip() for value in columns[0]]
+        # NumPy also takes "NaT", blanks and partial dates such as "2020-01"; only full ones go through
+        if not all(len(day) == 10 and day[4] == day[7] == "-" for day in days):
+            raise ValueError("not a YYYY-MM-DD date")
+        dates = np.array(days, dtype="datetime64[D]")
+        prices = np.array(columns[1:6], dtype=np.float64)
+        volumes = np.array(columns[6], dtype=np.int64)
+    except ValueError:
+        parsed = [row for row in map(_parse_price_row, rows) if row is not None]
+        return parsed, len(rows) - len(parsed)
+
+    parsed = [
+        dict(zip(("date",) + CSV_PRICE_COLUMNS, values))
+        for values in zip(dates.astype(object).tolist(), *prices.tolist(), volumes.tolist())
+    ]
+    return parsed, 0
+
+
+def _parse_price_row(row: List[str]) -> Optional[Dict]:
+    try:
+        return {
+            "date": datetime.strptime(row[0].strip(), "%Y-%m-%d").date(),
+            "open_price": float(row[1].strip()),
+            "high_price": float(row[2].strip()),
+            "low_price": float(row[3].strip()),
+            "close_price": float(row[4].strip()),
+            "adj_close_price": float(row[5].strip()),
+            "volume": int(row[6].strip()),
+        }
+    except (ValueError, IndexError):
+        return None
+
+
+def log_report(report: Dict):
+    logger.info(
+        "ingested file=%s ticker=%s rows=%d inserted=%d skipped=%d errors=%d seconds=%.2f rows_per_second=%.0f",
+        report["file"], report["ticker_symbol"], report["rows"], report["inserted"], report["skipped"],
+        report["errors"], report["seconds"], report["rows_per_second"],
+    )
+
+
+# Per-process session factory used by the ingestion pool
+_worker_session = None
+
+
+def _init_worker(database_url: str):
+    global _worker_session
+    _worker_session = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(database_url))
+
+
+def _ingest_in_worker(job: Tuple[str, str, Optional[int]]) -> Dict:
+    db = _worker_session()
+    try:
+        return ingest_csv_file(db, *job)
+    finally:
+        db.close()
 
 
 # Run initialization when script is executed directly
 if __name__ == "__main__":
-    init_db()
+    parser = argparse.ArgumentParser(description="Create the schema and bulk load stock price CSV files.")
+    parser.add_argument("csv_directory", nargs="?", default=None, help="Directory of CSV files (default: $CSV_DIRECTORY_PATH or ./data)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of files ingested in parallel")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows parsed and inserted per batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    init_db(args.csv_directory, args.workers, args.chunk_size)
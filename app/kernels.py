@@ -0,0 +1,373 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Sentinel used in batched results where the scalar kernels return None
+NO_INDEX = -1
+
+
+def _as_prices(closes: Sequence[float]) -> np.ndarray:
+    return np.asarray(closes, dtype=np.float64)
+
+
+def max_profit(closes: Sequence[float]) -> Tuple[Optional[int], Optional[int], float]:
+    """
+    Best single buy/sell over a series of close prices.
+
+    Returns ``(buy_index, sell_index, max_profit)`` with the tie-breaking of the
+    original loop: ``buy_index`` is the first occurrence of the lowest price and
+    ``sell_index`` the first index reaching the maximum profit, or None when no
+    trade is profitable. NaN prices are skipped.
+    """
+    closes = _as_prices(closes)
+    if closes.size == 0:
+        return None, None, 0
+
+    running_min = np.fmin.accumulate(closes)
+    if np.isnan(running_min[-1]):
+        return None, None, 0
+
+    buy_index = int(np.nanargmin(closes))
+    profits = closes - running_min
+    sell_index = int(np.nanargmax(profits))
+    best = profits[sell_index]
+
+    if not best > 0:
+        return buy_index, None, 0
+    return buy_index, sell_index, float(best)
+
+
+def total_profit(closes: Sequence[float]) -> float:
+    """
+    Sum of all positive close-to-close moves, i.e. unlimited free trades.
+
+    The gains are accumulated left to right, so the result is bit-identical to
+    a sequential Python loop over the same prices.
+    """
+    closes = _as_prices(closes)
+    if closes.size < 2:
+        return 0
+
+    deltas = np.diff(closes)
+    rising = deltas > 0
+    if not rising.any():
+        return 0
+    return float(np.cumsum(np.where(rising, deltas, 0.0))[-1])
+
+
+def _combine_summaries(left: Tuple[np.ndarray, ...], right: Tuple[np.ndarray, ...]) -> Tuple[np.ndarray, ...]:
+    """
+    Summary of two adjacent runs of rows, ``left`` first.
+
+    A summary is (low, low_row, high, high_row, best, best_row): the lowest and
+    highest price and the best profit ``max_profit`` finds within the run, each
+    with the first row reaching it. Ties keep the earlier row, as ``max_profit`` does.
+    """
+    low, low_row, high, high_row, best, best_row = left
+    right_low, right_low_row, right_high, right_high_row, right_best, right_best_row = right
+
+    # A sell in the right run profits from the lower of its own running minimum and the left low
+    cross = right_high - low
+    sell_best = np.maximum(right_best, cross)
+    sell_row = np.where(
+        (cross == sell_best) & ((right_best != sell_best) | (right_high_row < right_best_row)),
+        right_high_row,
+        right_best_row,
+    )
+    take_right = sell_best > best
+    take_low = right_low < low
+    take_high = right_high > high
+    return (
+        np.where(take_low, right_low, low),
+        np.where(take_low, right_low_row, low_row),
+        np.where(take_high, right_high, high),
+        np.where(take_high, right_high_row, high_row),
+        np.where(take_right, sell_best, best),
+        np.where(take_right, sell_row, best_row),
+    )
+
+
+def max_profit_batch(
+    closes: Sequence[float], starts: Sequence[int], ends: Sequence[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evaluate ``max_profit`` for many half-open slices [start, end) of one series.
+
+    Returns three arrays ``(buy_index, sell_index, max_profit)`` holding absolute
+    indices into ``closes``; ``NO_INDEX`` marks a missing buy or sell.
+
+    Every row starts one block of each power-of-two length, summarised as in
+    ``window_max_profit`` but with the row of every extreme. All slices are then
+    walked left to right through the blocks of their lengths' binary expansion
+    at once, so a batch costs O((n + q) log n) in a few vectorized passes per
+    block size. Profits are the same differences ``max_profit`` picks from, and
+    ties resolve the same way, so the results match it exactly.
+    """
+    closes = _as_prices(closes)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    lengths = np.maximum(ends - starts, 0)
+
+    buy_indices = np.full(len(starts), NO_INDEX, dtype=np.int64)
+    sell_indices = np.full(len(starts), NO_INDEX, dtype=np.int64)
+    profits = np.zeros(len(starts), dtype=np.float64)
+    if len(starts) == 0 or closes.size == 0 or not lengths.any():
+        return buy_indices, sell_indices, profits
+
+    # NaN rows can be neither the low, the high nor a sell
+    valid = ~np.isnan(closes)
+    rows = np.arange(closes.size, dtype=np.int64)
+    levels = [
+        (
+            np.where(valid, closes, np.inf), rows,
+            np.where(valid, closes, -np.inf), rows,
+            np.where(valid, 0.0, -np.inf), rows,
+        )
+    ]
+    size = 1
+    while 2 * size <= lengths.max():
+        previous = levels[-1]
+        levels.append(
+            _combine_summaries(
+                tuple(column[:-size] for column in previous), tuple(column[size:] for column in previous)
+            )
+        )
+        size *= 2
+
+    count = len(starts)
+    summary = (
+        np.full(count, np.inf), np.full(count, NO_INDEX, dtype=np.int64),
+        np.full(count, -np.inf), np.full(count, NO_INDEX, dtype=np.int64),
+        np.full(count, -np.inf), np.full(count, NO_INDEX, dtype=np.int64),
+    )
+    position = starts.copy()
+    for level in range(len(levels) - 1, -1, -1):
+        size = 1 << level
+        taken = (lengths & size) != 0
+        if not taken.any():
+            continue
+        at = np.where(taken, position, 0)
+        block = tuple(column[at] for column in levels[level])
+        combined = _combine_summaries(summary, block)
+        summary = tuple(np.where(taken, new, old) for new, old in zip(combined, summary))
+        position += np.where(taken, size, 0)
+
+    low, low_row, _, _, best, best_row = summary
+    has_price = np.isfinite(low)
+    profitable = has_price & (best > 0)
+    buy_indices[has_price] = low_row[has_price]
+    sell_indices[profitable] = best_row[profitable]
+    profits[profitable] = best[profitable]
+    return buy_indices, sell_indices, profits
+
+
+def total_profit_batch(
+    closes: Sequence[float], starts: Sequence[int], ends: Sequence[int]
+) -> np.ndarray:
+    """
+    Evaluate ``total_profit`` for many half-open slices [start, end) of one series,
+    as differences of one prefix sum of the gains.
+
+    Like ``window_total_profit``, the results may disagree with ``total_profit``
+    in the last bits; use the scalar kernel where exact values are reported.
+    """
+    closes = _as_prices(closes)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if closes.size < 2:
+        return np.zeros(len(starts), dtype=np.float64)
+
+    gains = np.diff(closes)
+    prefix = np.concatenate(([0.0], np.cumsum(np.where(gains > 0, gains, 0.0))))
+    spanning = ends - starts > 1
+    last = np.where(spanning, ends - 1, 0)
+    first = np.where(spanning, starts, 0)
+    return np.where(spanning, prefix[last] - prefix[first], 0.0)
+
+
+def k_transaction_profit(
+    closes: Sequence[float], max_transactions: int, fee: float = 0.0, cooldown: int = 0
+) -> Tuple[float, List[Tuple[int, int]]]:
+    """
+    Best profit from at most ``max_transactions`` non-overlapping buy/sell round
+    trips, paying ``fee`` per round trip and waiting ``cooldown`` rows after a
+    sell before buying again.
+
+    Returns ``(profit, trades)`` where ``trades`` lists the ``(buy_index,
+    sell_index)`` pairs of one optimal plan in chronological order; ties prefer
+    the earliest sell and then the earliest buy. NaN prices are skipped.
+
+    Layer ``j`` of the dynamic programme holds, for every row, the best cash
+    after at most ``j`` completed trades and the best position while holding
+    the ``j``-th share; each layer is two running maxima over the previous one,
+    so the cost is O(n * k) and every layer is a handful of vectorized passes.
+    Layers stop being added once an extra trade no longer helps.
+    """
+    closes = _as_prices(closes)
+    rows = np.flatnonzero(~np.isnan(closes))
+    prices = closes[rows]
+    n = prices.size
+    if n < 2 or max_transactions < 1:
+        return 0, []
+
+    # Buying at row t needs the cash of a sell at row t - cooldown - 1 or earlier
+    delay = min(cooldown + 1, n)
+    cash_layers = [np.zeros(n, dtype=np.float64)]
+    hold_layers = []
+    for _ in range(max_transactions):
+        previous = cash_layers[-1]
+        before_buy = np.concatenate((np.zeros(delay), previous[: n - delay]))
+        hold = np.maximum.accumulate(before_buy - prices)
+        sells = np.concatenate(([-np.inf], hold[:-1] + prices[1:] - fee))
+        cash = np.maximum(np.maximum.accumulate(sells), previous)
+        if np.array_equal(cash, previous):
+            break
+        hold_layers.append(hold)
+        cash_layers.append(cash)
+
+    # Walk the layers back from the last row to recover one optimal plan
+    trades = []
+    layer, t = len(hold_layers), n - 1
+    while layer > 0 and t > 0:
+        cash, previous = cash_layers[layer], cash_layers[layer - 1]
+        value = cash[t]
+        if value == previous[t]:
+            layer -= 1
+            continue
+
+        hold = hold_layers[layer - 1]
+        sells = hold[: t] + prices[1 : t + 1] - fee
+        sell = int(np.flatnonzero(sells == value)[0]) + 1
+        before_buy = np.concatenate((np.zeros(delay), previous[: n - delay]))[:sell]
+        buy = int(np.flatnonzero(before_buy - prices[:sell] == hold[sell - 1])[0])
+        trades.append((int(rows[buy]), int(rows[sell])))
+        layer -= 1
+        t = buy - delay
+    trades.reverse()
+    return float(cash_layers[-1][-1]), trades
+
+
+def window_max_profit(closes: Sequence[float], window: int) -> np.ndarray:
+    """
+    ``max_profit`` of every ``window``-row slice [i, i + window) of a series, indexed by i.
+
+    Each slice is tiled by power-of-two blocks, and every block is summarised as
+    (lowest price, highest price, best profit). Two adjacent summaries combine
+    in O(1), so all slices cost O(n log window) in total rather than O(n * window).
+    The values are the same differences ``max_profit`` picks from, so they match
+    it exactly.
+    """
+    closes = _as_prices(closes)
+    count = closes.size - window + 1
+    if window < 1 or count < 1:
+        return np.zeros(0, dtype=np.float64)
+
+    # Blocks of length 2**k starting at every row, doubled in place
+    low, high, best = closes, closes, np.zeros(closes.size, dtype=np.float64)
+    # Summary of the last ``covered`` rows of every slice, grown leftwards
+    tail_low = tail_high = tail_best = None
+    covered, size = 0, 1
+    while True:
+        if window & size:
+            offset = window - covered - size
+            block_low = low[offset : offset + count]
+            block_high = high[offset : offset + count]
+            block_best = best[offset : offset + count]
+            if tail_low is None:
+                tail_low, tail_high, tail_best = block_low, block_high, block_best
+            else:
+                tail_best = np.fmax(np.fmax(block_best, tail_best), tail_high - block_low)
+                tail_low = np.fmin(block_low, tail_low)
+                tail_high = np.fmax(block_high, tail_high)
+            covered += size
+        if covered == window:
+            break
+        best = np.fmax(np.fmax(best[:-size], best[size:]), high[size:] - low[:-size])
+        low = np.fmin(low[:-size], low[size:])
+        high = np.fmax(high[:-size], high[size:])
+        size *= 2
+    return tail_best
+
+
+def window_total_profit(closes: Sequence[float], window: int) -> np.ndarray:
+    """
+    ``total_profit`` of every ``window``-row slice of a series, from prefix sums of the gains.
+
+    The differences of prefix sums may disagree with ``total_profit`` in the
+    last bits, which is enough to rank slices.
+    """
+    closes = _as_prices(closes)
+    count = closes.size - window + 1
+    if window < 1 or count < 1:
+        return np.zeros(0, dtype=np.float64)
+
+    deltas = np.diff(closes)
+    prefix = np.concatenate(([0.0], np.cumsum(np.where(deltas > 0, deltas, 0.0))))
+    return prefix[window - 1 : window - 1 + count] - prefix[:count]
+
+
+def window_return_pct(closes: Sequence[float], window: int) -> np.ndarray:
+    """
+    Percentage change from the first to the last close of every ``window``-row
+    slice; NaN where either close is missing or the first is not positive.
+    """
+    closes = _as_prices(closes)
+    count = closes.size - window + 1
+    if window < 1 or count < 1:
+        return np.zeros(0, dtype=np.float64)
+
+    first, last = closes[:count], closes[window - 1 :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(first > 0, (last / first - 1.0) * 100.0, np.nan)
+
+
+def pairwise_return_stats(
+    returns: np.ndarray, min_periods: int = 2, block_size: int = 256
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairwise-complete covariance and correlation of the columns of a (days, tickers)
+    return matrix with NaN for missing days.
+
+    Every pair uses only the days on which both columns have a value, as in
+    pandas' ``DataFrame.cov``/``corr``. The sums behind the statistics are
+    matrix products of the masked, column-centered returns, evaluated for
+    ``block_size`` columns at a time so intermediates stay O(days * block_size).
+    Returns ``(observations, covariance, correlation)``; pairs with fewer than
+    ``min_periods`` common days are NaN.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    count = returns.shape[1]
+    valid = ~np.isnan(returns)
+    mask = valid.astype(np.float64)
+    # Centering on each column's own mean keeps the one-pass sums well conditioned
+    with np.errstate(invalid="ignore"):
+        means = np.nansum(returns, axis=0) / np.maximum(mask.sum(axis=0), 1)
+    centered = np.where(valid, returns - means, 0.0)
+    squared = centered * centered
+
+    observations = np.zeros((count, count), dtype=np.int64)
+    covariance = np.full((count, count), np.nan)
+    correlation = np.full((count, count), np.nan)
+    for a in range(0, count, block_size):
+        xa, ma, qa = centered[:, a : a + block_size], mask[:, a : a + block_size], squared[:, a : a + block_size]
+        for b in range(a, count, block_size):
+            xb, mb, qb = centered[:, b : b + block_size], mask[:, b : b + block_size], squared[:, b : b + block_size]
+            n = ma.T @ mb
+            sum_x, sum_y = xa.T @ mb, ma.T @ xb
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cov = (xa.T @ xb - sum_x * sum_y / n) / (n - 1)
+                var_x = (qa.T @ mb - sum_x * sum_x / n) / (n - 1)
+                var_y = (ma.T @ qb - sum_y * sum_y / n) / (n - 1)
+                corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+            enough = n >= max(min_periods, 2)
+            cov = np.where(enough, cov, np.nan)
+            corr = np.where(enough & (var_x > 0) & (var_y > 0), corr, np.nan)
+
+            rows, columns = slice(a, a + xa.shape[1]), slice(b, b + xb.shape[1])
+            observations[rows, columns] = n
+            covariance[rows, columns] = cov
+            correlation[rows, columns] = corr
+            observations[columns, rows] = n.T
+            covariance[columns, rows] = cov.T
+            correlation[columns, rows] = corr.T
+    return observations, covariance, correlation
@@ -1,6 +1,25 @@
-from fastapi import FastAPI
+import os
+import logging
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routes import router
-from app.init_db import init_db
+from app.async_routes import router as async_router
+from app.database import ASYNC_MODE, engine, get_async_engine, read_engines
+from app.executor import DeadlineExceeded, ExecutorOverloaded
+from app.init_db import init_db, init_status, start_init_db_in_background
+from app.metrics import MetricsMiddleware, instrument_engine, render_metrics
+
+# Log level of the app loggers (LOG_LEVEL, default INFO); DEBUG adds per-request and per-query lines
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger(__name__)
+
+# Responses at least this many bytes long are gzip-compressed for clients that accept it
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+
+# How startup initializes the database: "background" (default), "blocking" or "skip"
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "background").lower()
 
 # Initialize the FastAPI application
 app = FastAPI(
@@ -9,15 +28,45 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# Include your routers
+# Include your routers; in async mode the async routes take precedence over their sync twins
+if ASYNC_MODE:
+    app.include_router(async_router)
 app.include_router(router)
 
+# Per-route latency and per-request query counts, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+instrument_engine(engine, "sync")
+for index, read_engine in enumerate(read_engines):
+    if read_engine is not engine:
+        instrument_engine(read_engine, f"read{index}")
+if ASYNC_MODE:
+    instrument_engine(get_async_engine().sync_engine, "async")
+
+# Heavy analysis routes shed load instead of queueing without bound
+@app.exception_handler(ExecutorOverloaded)
+def executor_overloaded_handler(request: Request, error: ExecutorOverloaded):
+    return JSONResponse(status_code=503, content={"detail": str(error)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(DeadlineExceeded)
+def deadline_exceeded_handler(request: Request, error: DeadlineExceeded):
+    return JSONResponse(status_code=503, content={"detail": str(error)})
+
+
 # Initialize the database on app startup
 @app.on_event("startup")
 def on_startup():
-    print("Initializing the database...")
-    init_db()
-    print("Database initialized successfully.")
+    if INIT_DB_ON_STARTUP == "skip":
+        init_status["state"] = "skipped"
+        logger.info("skipping database initialization")
+    elif INIT_DB_ON_STARTUP == "blocking":
+        logger.info("initializing the database")
+        init_db()
+    else:
+        # Serve immediately; /ready reports when warm-up has finished
+        logger.info("initializing the database in the background")
+        start_init_db_in_background()
 
 # Root endpoint for health check or welcome
 @app.get("/", tags=["Health Check"])
@@ -26,3 +75,22 @@ def read_root():
     Welcome/Health Check endpoint.
     """
     return {"message": "Welcome to the Stock API. Access /docs for Swagger UI."}
+
+
+# Readiness probe for load balancers and orchestrators
+@app.get("/ready", tags=["Health Check"])
+def read_ready():
+    """
+    Report whether database initialization has finished (503 until it has).
+    """
+    ready = init_status["state"] in ("ready", "skipped")
+    return JSONResponse(status_code=200 if ready else 503, content=jsonable_encoder({"ready": ready, **init_status}))
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics", tags=["Health Check"], response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Request, query, connection pool and cache metrics in Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
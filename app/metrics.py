@@ -0,0 +1,354 @@
+import time
+import bisect
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the queries-per-request histogram buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in Prometheus text format.
+    """
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels, rendered in Prometheus text format.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> (per-bucket counts with a final +Inf bucket, sum, count)
+        self._values: Dict[Labels, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries executed per HTTP request.", QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Database time spent per HTTP request.", LATENCY_BUCKETS
+)
+DB_QUERIES = Counter("db_queries_total", "Database statements executed.")
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Database statement latency.", LATENCY_BUCKETS)
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out of a pool.")
+POOL_OVERFLOW_CHECKOUTS = Counter(
+    "db_pool_overflow_checkouts_total", "Checkouts served by overflow connections, i.e. under pool pressure."
+)
+POOL_WAITS = Counter(
+    "db_pool_waits_total", "Checkouts that found every pooled and overflow connection in use and had to wait."
+)
+POOL_WAIT_DURATION = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool, including waiting for a free one and opening a new one.",
+    LATENCY_BUCKETS,
+)
+
+# Query count and database time of the request being served, shared with threads it spawns
+_request_stats: ContextVar[Optional[Dict]] = ContextVar("request_stats", default=None)
+
+
+def request_stats() -> Optional[Dict]:
+    """
+    Return the {"queries", "db_seconds"} totals of the current request, if any.
+    """
+    return _request_stats.get()
+
+
+# Statement timing for every engine, including the one behind the async engine
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # A connection runs one statement at a time, so a single start time is enough
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started")
+    elapsed = time.perf_counter() - started
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db_seconds"] += elapsed
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("query seconds=%.6f statement=%s", elapsed, " ".join(statement.split())[:200])
+
+
+# Failed statements never reach after_cursor_execute; their start time is dropped here
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None:
+        context.connection.info.pop("query_started", None)
+
+
+# Engines whose pools are reported, by label
+_engines: Dict[str, Engine] = {}
+
+
+def instrument_engine(engine: Engine, label: str) -> None:
+    """
+    Report the connection pool of ``engine`` under ``engine="<label>"``.
+    """
+    if label in _engines:
+        return
+    _engines[label] = engine
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc(engine=label)
+        overflow = getattr(pool, "overflow", None)
+        if overflow is not None and overflow() > 0:
+            POOL_OVERFLOW_CHECKOUTS.inc(engine=label)
+
+    # Pools fire no event before a checkout, so the wait is timed around Pool.connect
+    connect = pool.connect
+
+    def _timed_connect():
+        exhausted = _pool_exhausted(pool)
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_WAIT_DURATION.observe(time.perf_counter() - started, engine=label)
+            if exhausted:
+                POOL_WAITS.inc(engine=label)
+
+    pool.connect = _timed_connect
+
+
+def _pool_exhausted(pool) -> bool:
+    # Only QueuePool makes callers wait: no idle connection and no overflow slot left
+    max_overflow = getattr(pool, "_max_overflow", None)
+    if max_overflow is None or max_overflow < 0 or not hasattr(pool, "checkedin"):
+        return False
+    return pool.checkedin() == 0 and pool.overflow() >= max_overflow
+
+
+def _route_label(scope: Dict) -> str:
+    # Templates rather than raw paths keep the label set bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and counting the queries it runs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"queries": 0, "db_seconds": 0.0}
+        token = _request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            route = _route_label(scope)
+            REQUEST_DURATION.observe(elapsed, method=scope["method"], route=route, status=str(status))
+            REQUEST_QUERIES.observe(stats["queries"], route=route)
+            REQUEST_DB_DURATION.observe(stats["db_seconds"], route=route)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "request method=%s route=%s status=%d seconds=%.6f queries=%d db_seconds=%.6f",
+                    scope["method"], route, status, elapsed, stats["queries"], stats["db_seconds"],
+                )
+
+
+def _pool_gauges(engines: Iterable[Tuple[str, Engine]]) -> List[str]:
+    gauges = {
+        "db_pool_size": "Configured pool size.",
+        "db_pool_checked_out": "Connections currently checked out.",
+        "db_pool_checked_in": "Idle connections held by the pool.",
+        "db_pool_overflow": "Connections open beyond the pool size.",
+    }
+    samples = {name: [] for name in gauges}
+    for label, engine in engines:
+        pool = engine.pool
+        for name, method in (
+            ("db_pool_size", "size"),
+            ("db_pool_checked_out", "checkedout"),
+            ("db_pool_checked_in", "checkedin"),
+            ("db_pool_overflow", "overflow"),
+        ):
+            if hasattr(pool, method):
+                value = getattr(pool, method)()
+                if name == "db_pool_overflow":
+                    # QueuePool counts unopened pool slots as negative overflow
+                    value = max(0, value)
+                samples[name].append(f"{name}{_format_labels((('engine', label),))} {_format_value(value)}")
+
+    lines = []
+    for name, help_text in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"] + samples[name]
+    return lines
+
+
+# Monotonic counts in the stats() of the analysis cache and executor, exported as counters
+CACHE_COUNTERS = {
+    "hits": "Analysis results served from the cache.",
+    "misses": "Analysis lookups that had to compute the result.",
+    "coalesced": "Analysis lookups that waited for the same computation already in flight.",
+    "evictions": "Cached analysis results evicted to stay within the size limits.",
+    "expirations": "Cached analysis results dropped after their TTL.",
+    "invalidations": "Cached analysis results dropped because their data changed.",
+}
+EXECUTOR_COUNTERS = {
+    "submitted": "Analysis jobs accepted by the executor.",
+    "completed": "Analysis jobs that finished successfully.",
+    "failed": "Analysis jobs that raised.",
+    "rejected": "Analysis jobs shed because the queue was full.",
+    "timed_out": "Analysis jobs whose caller gave up at the deadline.",
+}
+
+# The other stats, exported as gauges
+CACHE_GAUGES = {
+    "entries": "Analysis results currently cached.",
+    "bytes": "Estimated size of the cached analysis results.",
+    "in_flight": "Analysis computations currently running for the cache.",
+    "max_entries": "Configured maximum number of cached analysis results.",
+    "max_bytes": "Configured maximum size of the cached analysis results.",
+    "ttl_seconds": "Configured lifetime of a cached analysis result.",
+}
+EXECUTOR_GAUGES = {
+    "queued": "Analysis jobs waiting for a worker.",
+    "running": "Analysis jobs currently running.",
+    "mean_wait_seconds": "Mean time analysis jobs waited for a worker.",
+    "workers": "Configured number of analysis workers.",
+    "queue_limit": "Configured maximum number of waiting analysis jobs.",
+    "deadline_seconds": "Configured deadline of an analysis job.",
+}
+
+
+def _stat_metrics(prefix: str, stats: Dict, counters: Dict[str, str], gauges: Dict[str, str]) -> List[str]:
+    lines = []
+    for key, value in sorted(stats.items()):
+        if key in counters:
+            name, kind, help_text = f"{prefix}_{key}_total", "counter", counters[key]
+        else:
+            name, kind, help_text = f"{prefix}_{key}", "gauge", gauges.get(key, key.replace("_", " ").capitalize() + ".")
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    # Imported here to keep this module free of app dependencies at import time
+    from app.cache import analysis_cache
+    from app.executor import QUEUE_WAIT, analysis_executor
+
+    lines = []
+    for metric in (
+        REQUEST_DURATION,
+        REQUEST_QUERIES,
+        REQUEST_DB_DURATION,
+        DB_QUERIES,
+        DB_QUERY_DURATION,
+        POOL_CHECKOUTS,
+        POOL_OVERFLOW_CHECKOUTS,
+        POOL_WAITS,
+        POOL_WAIT_DURATION,
+        QUEUE_WAIT,
+    ):
+        lines += metric.render()
+    lines += _pool_gauges(list(_engines.items()))
+    lines += _stat_metrics("analysis_cache", analysis_cache.stats(), CACHE_COUNTERS, CACHE_GAUGES)
+    lines += _stat_metrics("analysis_executor", analysis_executor.stats(), EXECUTOR_COUNTERS, EXECUTOR_GAUGES)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,44 @@
+import logging
+
+from sqlalchemy import delete, func, inspect, select
+from sqlalchemy.engine import Engine
+from app.models import StockPrice
+
+logger = logging.getLogger(__name__)
+
+# Unique (ticker_symbol, date) index declared on StockPrice
+STOCK_PRICE_INDEX = next(
+    index for index in StockPrice.__table__.indexes if index.name == "ix_stock_prices_ticker_symbol_date"
+)
+
+
+def migrate_stock_price_index(engine: Engine) -> bool:
+    """
+    Add the unique (ticker_symbol, date) index to an existing stock_prices table.
+
+    ``create_all`` never alters tables that already exist, so databases created
+    before the index was declared are upgraded here. Duplicate rows are removed
+    first, keeping the lowest id of each (ticker_symbol, date). Returns True if
+    the index had to be created.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(StockPrice.__tablename__):
+        return False
+    if any(index["name"] == STOCK_PRICE_INDEX.name for index in inspector.get_indexes(StockPrice.__tablename__)):
+        return False
+
+    # The grouped derived table is materialized, which MySQL requires when
+    # deleting from the table the subquery reads
+    keep = (
+        select(func.min(StockPrice.id).label("id"))
+        .group_by(StockPrice.ticker_symbol, StockPrice.date)
+        .subquery()
+    )
+    with engine.begin() as connection:
+        removed = connection.execute(
+            delete(StockPrice).where(StockPrice.id.not_in(select(keep.c.id)))
+        ).rowcount
+        STOCK_PRICE_INDEX.create(connection)
+
+    logger.info("created index=%s removed_duplicates=%d", STOCK_PRICE_INDEX.name, removed)
+    return True
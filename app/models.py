@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, BigInteger
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, BigInteger, Index
 from app.base import Base
 
 class Stock(Base):
@@ -12,6 +12,10 @@ class Stock(Base):
 
 class StockPrice(Base):
     __tablename__ = "stock_prices"
+    __table_args__ = (
+        # One row per ticker and day; also serves every ticker + date range query
+        Index("ix_stock_prices_ticker_symbol_date", "ticker_symbol", "date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     ticker_symbol = Column(String(50), nullable=False)
@@ -22,3 +26,28 @@ class StockPrice(Base):
     close_price = Column(Float, nullable=True)
     adj_close_price = Column(Float, nullable=True)
     volume = Column(BigInteger, nullable=True)
+
+class IngestedFile(Base):
+    """
+    Manifest entry of a CSV file loaded by init_db, used to skip unchanged files.
+    """
+    __tablename__ = "ingested_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(512), nullable=False, unique=True)
+    ticker_symbol = Column(String(50), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime = Column(Float, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    ingested_at = Column(DateTime, nullable=False)
+
+class DataVersion(Base):
+    """
+    Change counter of a slice of the data, bumped in the transaction of every
+    write to it; see ``app.versions``.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,418 @@
+import os
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.indicators import IndicatorSlot
+from app.models import StockPrice
+from app.range_index import IndexSlot, RangeIndex
+from app.rollups import Rollup, RollupSlot
+
+# Numeric columns kept for every ticker, named after the StockPrice attributes
+PRICE_COLUMNS = ("open_price", "high_price", "low_price", "close_price", "adj_close_price", "volume")
+
+# Initial number of rows allocated for a ticker that starts out empty
+MIN_CAPACITY = 64
+
+
+def _to_day(value: date) -> np.datetime64:
+    return np.datetime64(value, "D")
+
+
+class PriceSeries:
+    """
+    Immutable view of one ticker's price history, sorted by date.
+
+    Dates are a ``datetime64[D]`` array and every price column is a contiguous
+    ``float64`` array (``volume`` is ``int64``). Missing prices are stored as NaN.
+    """
+
+    __slots__ = ("ticker_symbol", "dates", "_index_slot", "_rollup_slot", "_indicator_slot") + PRICE_COLUMNS
+
+    def __init__(
+        self,
+        ticker_symbol: str,
+        dates: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        index_slot: Optional[IndexSlot] = None,
+        rollup_slot: Optional[RollupSlot] = None,
+        indicator_slot: Optional[IndicatorSlot] = None,
+    ):
+        self.ticker_symbol = ticker_symbol
+        self.dates = dates
+        for name in PRICE_COLUMNS:
+            setattr(self, name, columns[name])
+        self._index_slot = index_slot if index_slot is not None else IndexSlot()
+        self._rollup_slot = rollup_slot if rollup_slot is not None else RollupSlot()
+        self._indicator_slot = indicator_slot if indicator_slot is not None else IndicatorSlot()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def bounds(self, start_date: date, end_date: date) -> Tuple[int, int]:
+        """
+        Return the half-open index range [lo, hi) of rows dated within [start_date, end_date].
+        """
+        lo = int(np.searchsorted(self.dates, _to_day(start_date), side="left"))
+        hi = int(np.searchsorted(self.dates, _to_day(end_date), side="right"))
+        return lo, max(lo, hi)
+
+    def date_at(self, index: int) -> date:
+        return self.dates[index].item()
+
+    def range_index(self) -> RangeIndex:
+        """
+        Return the range-query index over the close prices, building it on first use.
+        """
+        return self._index_slot.get(self.close_price)
+
+    def rollup(self, interval: str) -> Rollup:
+        """
+        Return the weekly, monthly or yearly OHLCV bars, building or extending them on use.
+        """
+        return self._rollup_slot.get(interval, self.dates, {name: getattr(self, name) for name in PRICE_COLUMNS})
+
+    def indicator(self, name: str, window: int, field: str, lo: int, hi: int) -> Tuple[List[int], List[float]]:
+        """
+        Return the (rows, values) of an indicator within rows [lo, hi), computing or extending it on use.
+        """
+        return self._indicator_slot.points(name, window, field, getattr(self, field), lo, hi)
+
+    def coarse(self, interval: str) -> "CoarseSeries":
+        """
+        Return this series resampled to one row per weekly, monthly or yearly bar.
+        """
+        rollup = self.rollup(interval)
+        if rollup.series is None:
+            rollup.series = CoarseSeries(self.ticker_symbol, rollup.first_dates, rollup.last_dates, rollup.columns)
+        return rollup.series
+
+
+class CoarseSeries(PriceSeries):
+    """
+    Price series with one row per rollup bar, dated by the bar's last trading day.
+
+    ``bounds`` only takes in bars whose trading days all lie within the range,
+    so a bar never mixes prices from inside and outside an analysis window.
+    """
+
+    __slots__ = ("first_dates",)
+
+    def __init__(self, ticker_symbol: str, first_dates: np.ndarray, last_dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        super().__init__(ticker_symbol, last_dates, columns)
+        self.first_dates = first_dates
+
+    def bounds(self, start_date: date, end_date: date) -> Tuple[int, int]:
+        lo = int(np.searchsorted(self.first_dates, _to_day(start_date), side="left"))
+        hi = int(np.searchsorted(self.dates, _to_day(end_date), side="right"))
+        return lo, max(lo, hi)
+
+
+class _TickerBuffer:
+    """
+    Growable backing storage for a ticker. Rows past the published length are
+    scratch space, so appending in place never disturbs a published PriceSeries.
+    """
+
+    def __init__(self, ticker_symbol: str, dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.ticker_symbol = ticker_symbol
+        self.size = len(dates)
+        self.dates = dates
+        self.columns = columns
+        self.index_slot = IndexSlot()
+        self.rollup_slot = RollupSlot()
+        self.indicator_slot = IndicatorSlot()
+        self.series = self._publish()
+
+    def _publish(self) -> PriceSeries:
+        n = self.size
+        return PriceSeries(
+            self.ticker_symbol,
+            self.dates[:n],
+            {name: column[:n] for name, column in self.columns.items()},
+            self.index_slot,
+            self.rollup_slot,
+            self.indicator_slot,
+        )
+
+    def _grow(self, capacity: int) -> None:
+        dates = np.empty(capacity, dtype="datetime64[D]")
+        dates[: self.size] = self.dates[: self.size]
+        columns = {}
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            columns[name] = grown
+        self.dates = dates
+        self.columns = columns
+
+    def insert(self, day: np.datetime64, values: Dict[str, float]) -> PriceSeries:
+        n = self.size
+        position = n if n == 0 or day >= self.dates[n - 1] else int(
+            np.searchsorted(self.dates[:n], day, side="right")
+        )
+
+        if position == n and n < len(self.dates):
+            # Fast path: the new row goes at the end and fits in spare capacity
+            self.dates[n] = day
+            for name, column in self.columns.items():
+                column[n] = values[name]
+        else:
+            # Reallocate so that published views keep seeing their original rows
+            self._grow(max(MIN_CAPACITY, 2 * len(self.dates), n + 1))
+            if position < n:
+                # Rows shifted, so the range index, rollups and indicators have to be rebuilt for new snapshots
+                self.index_slot = IndexSlot()
+                self.rollup_slot = RollupSlot()
+                self.indicator_slot = IndicatorSlot()
+            self.dates[position + 1 : n + 1] = self.dates[position:n].copy()
+            self.dates[position] = day
+            for name, column in self.columns.items():
+                column[position + 1 : n + 1] = column[position:n].copy()
+                column[position] = values[name]
+
+        self.size = n + 1
+        self.series = self._publish()
+        return self.series
+
+    def merge(self, days: np.ndarray, columns: Dict[str, np.ndarray]) -> PriceSeries:
+        """
+        Insert or replace many rows at once. ``days`` must be sorted and unique;
+        where a day already exists the new values replace the stored ones.
+        """
+        n, k = self.size, len(days)
+        if n == 0 or days[0] > self.dates[n - 1]:
+            # Appending after the last row keeps the range index, rollups and indicators valid
+            if n + k > len(self.dates):
+                self._grow(max(MIN_CAPACITY, 2 * len(self.dates), n + k))
+            self.dates[n : n + k] = days
+            for name, column in self.columns.items():
+                column[n : n + k] = columns[name]
+            self.size = n + k
+        else:
+            # Existing rows come first in the concatenation, so the last row of each day is the new one
+            merged_dates = np.concatenate((self.dates[:n], days))
+            order = np.argsort(merged_dates, kind="stable")
+            sorted_dates = merged_dates[order]
+            keep = order[np.append(sorted_dates[1:] != sorted_dates[:-1], True)]
+            size = len(keep)
+            capacity = max(MIN_CAPACITY, 2 * size)
+
+            self.dates = np.empty(capacity, dtype="datetime64[D]")
+            self.dates[:size] = merged_dates[keep]
+            merged_columns = {}
+            for name, column in self.columns.items():
+                merged = np.empty(capacity, dtype=column.dtype)
+                merged[:size] = np.concatenate((column[:n], columns[name]))[keep]
+                merged_columns[name] = merged
+            self.columns = merged_columns
+            self.size = size
+            self.index_slot = IndexSlot()
+            self.rollup_slot = RollupSlot()
+            self.indicator_slot = IndicatorSlot()
+
+        self.series = self._publish()
+        return self.series
+
+
+def price_arrays_query(ticker_symbols: Optional[Iterable[str]] = None) -> Select:
+    """
+    Select the price columns of every row, or of the rows of ``ticker_symbols``,
+    in (ticker_symbol, date) order so the unique index serves the sort.
+    """
+    stmt = select(
+        StockPrice.ticker_symbol,
+        StockPrice.date,
+        *(getattr(StockPrice, name) for name in PRICE_COLUMNS),
+    ).order_by(StockPrice.ticker_symbol, StockPrice.date)
+    if ticker_symbols is not None:
+        stmt = stmt.where(StockPrice.ticker_symbol.in_(list(ticker_symbols)))
+    return stmt
+
+
+def read_price_arrays(
+    db: Session, ticker_symbols: Optional[Iterable[str]] = None
+) -> Dict[str, Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    """
+    Read the whole ``stock_prices`` table, or the rows of ``ticker_symbols``, with
+    one column-projected query and return ``{ticker: (dates, columns)}`` with
+    every ticker's rows in date order.
+    """
+    rows = db.execute(price_arrays_query(ticker_symbols)).all()
+    if not rows:
+        return {}
+
+    tickers, dates, *values = zip(*rows)
+    tickers = np.array(tickers, dtype=object)
+    dates = np.array(dates, dtype="datetime64[D]")
+    columns = {}
+    for name, column in zip(PRICE_COLUMNS, values):
+        as_float = np.array(column, dtype=np.float64)
+        if name == "volume":
+            columns[name] = np.nan_to_num(as_float).astype(np.int64)
+        else:
+            columns[name] = as_float
+
+    # Group rows by ticker; the stable sort keeps them in date order
+    symbols, inverse = np.unique(tickers, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    splits = np.searchsorted(inverse[order], np.arange(1, len(symbols)))
+
+    return {
+        symbol: (dates[idx], {name: column[idx] for name, column in columns.items()})
+        for symbol, idx in zip(symbols, np.split(order, splits))
+    }
+
+
+def _row_values(stock_price: StockPrice) -> Dict[str, float]:
+    values = {}
+    for name in PRICE_COLUMNS:
+        value = getattr(stock_price, name)
+        if name == "volume":
+            values[name] = 0 if value is None else int(value)
+        else:
+            values[name] = np.nan if value is None else float(value)
+    return values
+
+
+class PriceStore:
+    """
+    Process-wide columnar cache of the ``stock_prices`` table, keyed by ticker.
+
+    The table is read once, on first use, with a single column-projected query,
+    or mapped from the current snapshot in ``snapshot_dir`` when that snapshot
+    matches the table (see ``app.snapshot``). Afterwards the write paths in
+    ``app.crud`` keep it current through ``add``, ``merge`` and ``reset``, and
+    tickers written by other processes are marked with ``invalidate`` and
+    read again on next use.
+    """
+
+    def __init__(self, snapshot_dir: Optional[str] = None):
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.RLock()
+        self._buffers: Dict[str, _TickerBuffer] = {}
+        self._stale: Set[str] = set()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded and not self._stale:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._buffers = self._load(db)
+                self._stale = set()
+                self._loaded = True
+            elif self._stale:
+                stale, self._stale = self._stale, set()
+                arrays = read_price_arrays(db, stale)
+                for symbol in stale:
+                    if symbol in arrays:
+                        self._buffers[symbol] = _TickerBuffer(symbol, *arrays[symbol])
+                    else:
+                        self._buffers.pop(symbol, None)
+
+    def _load(self, db: Session) -> Dict[str, _TickerBuffer]:
+        arrays = None
+        if self.snapshot_dir:
+            # Imported here because app.snapshot builds on this module
+            from app.snapshot import open_current_snapshot
+
+            arrays = open_current_snapshot(self.snapshot_dir, db)
+        if arrays is None:
+            arrays = read_price_arrays(db)
+        return {symbol: _TickerBuffer(symbol, dates, columns) for symbol, (dates, columns) in arrays.items()}
+
+    def get(self, db: Session, ticker_symbol: str) -> Optional[PriceSeries]:
+        """
+        Return the current price series for a ticker, or None if it has no prices.
+        """
+        self.ensure_loaded(db)
+        buffer = self._buffers.get(ticker_symbol)
+        return buffer.series if buffer is not None else None
+
+    def peek(self, ticker_symbol: str) -> Optional[PriceSeries]:
+        """
+        Return the cached series for a ticker without loading the store.
+        """
+        buffer = self._buffers.get(ticker_symbol)
+        return buffer.series if buffer is not None else None
+
+    def all_series(self, db: Session) -> Dict[str, PriceSeries]:
+        """
+        Return the current price series of every ticker.
+        """
+        self.ensure_loaded(db)
+        return {symbol: buffer.series for symbol, buffer in list(self._buffers.items())}
+
+    def add(self, stock_price: StockPrice) -> None:
+        """
+        Record a newly persisted price row. A no-op until the store has been loaded.
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            buffer = self._buffers.get(stock_price.ticker_symbol)
+            if buffer is None:
+                buffer = _TickerBuffer(
+                    stock_price.ticker_symbol,
+                    np.empty(0, dtype="datetime64[D]"),
+                    {
+                        name: np.empty(0, dtype=np.int64 if name == "volume" else np.float64)
+                        for name in PRICE_COLUMNS
+                    },
+                )
+                self._buffers[stock_price.ticker_symbol] = buffer
+            buffer.insert(_to_day(stock_price.date), _row_values(stock_price))
+
+    def merge(self, ticker_symbol: str, days: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Record a batch of upserted rows of one ticker (sorted, unique ``days``).
+        A no-op until the store has been loaded.
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            buffer = self._buffers.get(ticker_symbol)
+            if buffer is None:
+                self._buffers[ticker_symbol] = _TickerBuffer(
+                    ticker_symbol, days.copy(), {name: columns[name].copy() for name in PRICE_COLUMNS}
+                )
+            else:
+                buffer.merge(days, columns)
+
+    def invalidate(self, ticker_symbols: Iterable[str]) -> None:
+        """
+        Mark tickers whose prices were written elsewhere; the next read reloads
+        just their rows. A no-op until the store has been loaded.
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                self._stale.update(ticker_symbols)
+
+    def reset(self) -> None:
+        """
+        Drop all cached series; the next read reloads them from the database.
+        """
+        with self._lock:
+            self._buffers = {}
+            self._stale = set()
+            self._loaded = False
+
+
+# Shared store used by the request handlers; PRICE_SNAPSHOT_DIR serves it from a mapped snapshot
+price_store = PriceStore(os.getenv("PRICE_SNAPSHOT_DIR") or None)
@@ -0,0 +1,120 @@
+"""
+EXPLAIN the statements the app sends to stock_prices and check that they use
+the unique (ticker_symbol, date) index.
+
+    python -m app.query_plans [--database-url URL]
+
+Every statement is built by the function that issues it, so the check follows
+the real traffic. Two of them read the index from end to end on purpose and
+are only checked for sorting: the price store load, which reads every row once
+per process and after bulk writes, and the async better-companies window, which
+needs every other ticker's rows within the dates. Neither can be narrowed by
+the index, and both take their (ticker_symbol, date) order from it instead of
+a sort.
+"""
+import sys
+import argparse
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+from app.async_crud import span_closes_query, window_prices_query
+from app.crud import existing_price_keys_query
+from app.export import EXPORT_COLUMNS, price_rows_query
+from app.init_db import stored_dates_query
+from app.models import Base, StockPrice
+from app.migrations import STOCK_PRICE_INDEX
+from app.price_store import price_arrays_query
+
+# Queries that read the whole index on purpose (see the module docstring)
+FULL_SCAN_QUERIES = frozenset({"price_store_load", "better_companies_window"})
+
+
+def analysis_queries() -> Dict[str, Select]:
+    """
+    The stock_prices reads of the analysis, ingestion and export paths, with sample parameters.
+    """
+    ticker, start, end = "AAPL", date(2020, 1, 1), date(2020, 12, 31)
+    return {
+        "price_store_load": price_arrays_query(),
+        "price_store_reload": price_arrays_query([ticker, "MSFT"]),
+        "span_closes": span_closes_query(ticker, start, end),
+        "better_companies_window": window_prices_query(ticker, start, end),
+        "upsert_existing_keys": existing_price_keys_query({ticker, "MSFT"}, start, end),
+        "ingest_stored_dates": stored_dates_query(ticker),
+        "export_rows": price_rows_query(ticker, EXPORT_COLUMNS, start, end),
+    }
+
+
+def explain(connection: Connection, statement: Select) -> List[dict]:
+    """
+    Return the database's query plan for ``statement`` as a list of row dicts.
+    """
+    # IN lists are expanded into one parameter per value, as they are when executed
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    result = connection.exec_driver_sql(prefix + str(compiled), params)
+    return [dict(row._mapping) for row in result]
+
+
+def plan_problems(dialect_name: str, plan: List[dict], full_scan: bool = False) -> List[str]:
+    """
+    List the ways a plan fails to use the (ticker_symbol, date) index.
+
+    With ``full_scan`` the plan may read every row, as long as it does so in index order.
+    """
+    problems = []
+    if dialect_name == "sqlite":
+        details = [row["detail"] for row in plan]
+        if not full_scan and not any(STOCK_PRICE_INDEX.name in detail for detail in details):
+            problems.append(f"index {STOCK_PRICE_INDEX.name} not used")
+        if not full_scan and any(detail.startswith("SCAN") and "stock_prices" in detail for detail in details):
+            problems.append("full scan of stock_prices")
+        if any("TEMP B-TREE" in detail for detail in details):
+            problems.append("extra sort instead of index order")
+    elif dialect_name in ("mysql", "mariadb"):
+        for row in plan:
+            if row.get("table") != StockPrice.__tablename__:
+                continue
+            if not full_scan and row.get("type") == "ALL":
+                problems.append("full scan of stock_prices")
+            if not full_scan and row.get("key") != STOCK_PRICE_INDEX.name:
+                problems.append(f"index {STOCK_PRICE_INDEX.name} not used (key={row.get('key')})")
+            if "filesort" in (row.get("Extra") or ""):
+                problems.append("extra sort instead of index order")
+    return problems
+
+
+def check_query_plans(engine: Optional[Engine] = None) -> Dict[str, List[str]]:
+    """
+    EXPLAIN every analysis query and return the problems found, keyed by query name.
+
+    Without an engine the check runs against an in-memory SQLite stand-in.
+    """
+    if engine is None:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        return {
+            name: plan_problems(engine.dialect.name, explain(connection, statement), name in FULL_SCAN_QUERIES)
+            for name, statement in analysis_queries().items()
+        }
+
+
+# Exit non-zero if any analysis query would scan stock_prices
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that stock price queries use the (ticker_symbol, date) index.")
+    parser.add_argument("--database-url", default=None, help="Database to EXPLAIN against (default: in-memory SQLite)")
+    args = parser.parse_args()
+
+    results = check_query_plans(create_engine(args.database_url) if args.database_url else None)
+    for name, problems in results.items():
+        print(f"{name}: {'OK' if not problems else '; '.join(problems)}")
+    sys.exit(1 if any(results.values()) else 0)
@@ -0,0 +1,240 @@
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Node of the max-profit segment tree:
+# (min price, index of first min, max price, index of first max, best profit, index of first best sell)
+_EMPTY_NODE = (float("inf"), -1, float("-inf"), -1, 0.0, -1)
+
+
+def _merge_arrays(left: tuple, right: tuple) -> tuple:
+    """
+    Merge runs of adjacent node pairs, ``left`` nodes first, one tree level at a time.
+    """
+    l_min, l_min_idx, l_max, l_max_idx, l_best, l_sell = left
+    r_min, r_min_idx, r_max, r_max_idx, r_best, r_sell = right
+
+    take_right_min = r_min < l_min
+    take_right_max = r_max > l_max
+    cross = r_max - l_min
+    best = np.maximum(np.maximum(l_best, r_best), cross)
+
+    right_sell = np.where(
+        (r_best == best) & (cross == best),
+        np.minimum(r_sell, r_max_idx),
+        np.where(r_best == best, r_sell, r_max_idx),
+    )
+    sell = np.where(best > 0, np.where(l_best == best, l_sell, right_sell), -1)
+
+    return (
+        np.where(take_right_min, r_min, l_min),
+        np.where(take_right_min, r_min_idx, l_min_idx),
+        np.where(take_right_max, r_max, l_max),
+        np.where(take_right_max, r_max_idx, l_max_idx),
+        best,
+        sell,
+    )
+
+
+class RangeIndex:
+    """
+    Range-query index over one ticker's close prices.
+
+    * Prefix sums of positive close-to-close moves answer ``total_profit`` for
+      any window with two lookups.
+    * A segment tree of (min, max, best profit) nodes answers the single-trade
+      ``max_profit`` for any window in O(log n), with the same buy/sell
+      tie-breaking as ``app.kernels.max_profit``.
+
+    Both structures grow by appending prices at the end.
+    """
+
+    def __init__(self, closes: np.ndarray):
+        self._size = 0
+        self._last_close = np.nan
+        self._rebuild(np.asarray(closes, dtype=np.float64), max(1, len(closes)))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _rebuild(self, closes: np.ndarray, capacity: int) -> None:
+        n = len(closes)
+        capacity = 1 << max(0, int(capacity - 1).bit_length())
+
+        # Prefix sums: gains[i] is the sum of the positive moves up to row i
+        deltas = np.diff(closes)
+        rising = deltas > 0
+        gains = np.zeros(capacity, dtype=np.float64)
+        rises = np.zeros(capacity, dtype=np.int64)
+        if n > 1:
+            gains[1:n] = np.cumsum(np.where(rising, deltas, 0.0))
+            rises[1:n] = np.cumsum(rising)
+
+        # Leaves live at [capacity, 2 * capacity)
+        tree = [
+            np.full(2 * capacity, _EMPTY_NODE[0]),
+            np.full(2 * capacity, -1, dtype=np.int64),
+            np.full(2 * capacity, _EMPTY_NODE[2]),
+            np.full(2 * capacity, -1, dtype=np.int64),
+            np.zeros(2 * capacity),
+            np.full(2 * capacity, -1, dtype=np.int64),
+        ]
+        self._write_leaves(tree, capacity, 0, closes)
+
+        # Swapped in as one tuple so concurrent readers never mix two layouts
+        self._state = (capacity, tree, gains, rises)
+        self._size = n
+        self._last_close = closes[-1] if n else np.nan
+
+    @staticmethod
+    def _write_leaves(tree: list, capacity: int, start: int, closes: np.ndarray) -> None:
+        """
+        Store ``closes`` as the leaves of rows [start, start + len(closes)) and
+        re-merge their ancestors, one vectorized pass per tree level.
+        """
+        if len(closes) == 0:
+            return
+        # NaN prices never buy or sell
+        valid = ~np.isnan(closes)
+        positions = np.arange(start, start + len(closes), dtype=np.int64)
+        leaves = slice(capacity + start, capacity + start + len(closes))
+        tree[0][leaves] = np.where(valid, closes, np.inf)
+        tree[1][leaves] = np.where(valid, positions, -1)
+        tree[2][leaves] = np.where(valid, closes, -np.inf)
+        tree[3][leaves] = np.where(valid, positions, -1)
+
+        first, last = leaves.start, leaves.stop - 1
+        while first > 1:
+            first //= 2
+            last //= 2
+            parents = np.arange(first, last + 1)
+            merged = _merge_arrays(
+                tuple(array[2 * parents] for array in tree),
+                tuple(array[2 * parents + 1] for array in tree),
+            )
+            for array, values in zip(tree, merged):
+                array[parents] = values
+
+    def extend(self, closes: np.ndarray) -> None:
+        """
+        Append new close prices at the end of the indexed series.
+
+        The prefix sums and the tree nodes above the new rows are updated in a
+        few vectorized passes, whatever the number of rows appended.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        n, k = self._size, len(closes)
+        if k == 0:
+            return
+        capacity, tree, gains, rises = self._state
+        if n + k > capacity:
+            self._rebuild(np.concatenate((self.closes(), closes)), 2 * (n + k))
+            return
+
+        # Accumulated left to right from the last prefix, as a rebuild would
+        moves = np.diff(np.concatenate(([self._last_close], closes))) if n else np.diff(closes)
+        rising = moves > 0
+        first = max(n, 1)
+        gains[first : n + k] = np.cumsum(np.concatenate(([gains[first - 1]], np.where(rising, moves, 0.0))))[1:]
+        rises[first : n + k] = rises[first - 1] + np.cumsum(rising)
+
+        self._write_leaves(tree, capacity, n, closes)
+        # Readers only look at rows below the size, so it grows once the rows are in place
+        self._size = n + k
+        self._last_close = closes[-1]
+
+    def append(self, close: float) -> None:
+        self.extend([close])
+
+    def closes(self) -> np.ndarray:
+        """
+        Return the indexed close prices (NaN where a price was missing).
+        """
+        capacity, tree, _, _ = self._state
+        leaves = tree[0][capacity : capacity + self._size]
+        return np.where(np.isinf(leaves), np.nan, leaves)
+
+    def total_profit(self, lo: int, hi: int) -> float:
+        """
+        Sum of positive close-to-close moves within rows [lo, hi), in O(1).
+
+        The prefix-sum difference can differ from a left-to-right sum of the
+        same moves in the last bits.
+        """
+        _, _, gains, rises = self._state
+        if hi - lo < 2 or rises[hi - 1] == rises[lo]:
+            return 0
+        return float(gains[hi - 1] - gains[lo])
+
+    def max_profit(self, lo: int, hi: int) -> Tuple[Optional[int], Optional[int], float]:
+        """
+        Best single buy/sell within rows [lo, hi), in O(log n).
+
+        Returns absolute ``(buy_index, sell_index, max_profit)`` exactly like
+        ``app.kernels.max_profit`` would for ``closes[lo:hi]``.
+        """
+        if lo >= hi:
+            return None, None, 0
+        capacity, tree, _, _ = self._state
+        # The O(log n) nodes covering the rows, in row order
+        left_nodes, right_nodes = [], []
+        l, r = lo + capacity, hi + capacity
+        while l < r:
+            if l & 1:
+                left_nodes.append(l)
+                l += 1
+            if r & 1:
+                r -= 1
+                right_nodes.append(r)
+            l //= 2
+            r //= 2
+        nodes = np.array(left_nodes + right_nodes[::-1], dtype=np.int64)
+        lows, low_rows, highs, high_rows, bests, sells = (array[nodes] for array in tree)
+
+        # A sell in a node profits from the lower of its own running minimum and the nodes before it
+        lows_before = np.empty(len(nodes))
+        lows_before[0] = np.inf
+        np.minimum.accumulate(lows[:-1], out=lows_before[1:])
+        crosses = highs - lows_before
+        candidates = np.maximum(bests, crosses)
+
+        first = int(lows.argmin())
+        if np.isinf(lows[first]):
+            return None, None, 0
+        buy_index = int(low_rows[first])
+
+        # The first node reaching the best profit holds the first sell reaching it
+        node = int(candidates.argmax())
+        best = float(candidates[node])
+        if not best > 0:
+            return buy_index, None, 0
+        if bests[node] != best:
+            sell_index = int(high_rows[node])
+        elif crosses[node] == best:
+            sell_index = int(min(sells[node], high_rows[node]))
+        else:
+            sell_index = int(sells[node])
+        return buy_index, sell_index, best
+
+
+class IndexSlot:
+    """
+    Lazily built RangeIndex shared by every PriceSeries published from the same
+    rows. Series that have grown since the last query are caught up by appending.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Optional[RangeIndex] = None
+
+    def get(self, closes: np.ndarray) -> RangeIndex:
+        index = self._index
+        if index is None or len(index) < len(closes):
+            with self._lock:
+                if self._index is None:
+                    self._index = RangeIndex(closes)
+                elif len(self._index) < len(closes):
+                    self._index.extend(closes[len(self._index):])
+                index = self._index
+        return index
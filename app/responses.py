@@ -0,0 +1,33 @@
+import json
+from datetime import date
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+
+def _encode_default(value: Any) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that encodes plain dicts and lists straight to bytes.
+
+    Returning one from a route skips FastAPI's response-model validation and
+    ``jsonable_encoder`` pass, so the content must already have the shape of the
+    declared model, with keys in field order. The encoder settings are those of
+    ``JSONResponse``, and dates are written in ISO format as pydantic does, so
+    the bytes are the same as on the validated path.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_encode_default,
+        ).encode("utf-8")
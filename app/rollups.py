@@ -0,0 +1,140 @@
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+# Supported bar intervals
+INTERVALS = ("weekly", "monthly", "yearly")
+
+
+def period_keys(dates: np.ndarray, interval: str) -> np.ndarray:
+    """
+    Integer key of the period each ``datetime64[D]`` day falls in; weeks start on Monday.
+    """
+    if interval == "weekly":
+        # Day 0 (1970-01-01) is a Thursday, so shifting by 3 days aligns weeks on Mondays
+        return (dates.astype(np.int64) + 3) // 7
+    if interval == "monthly":
+        return dates.astype("datetime64[M]").astype(np.int64)
+    if interval == "yearly":
+        return dates.astype("datetime64[Y]").astype(np.int64)
+    raise ValueError(f"Unknown rollup interval: {interval}")
+
+
+def period_starts(keys: np.ndarray, interval: str) -> np.ndarray:
+    """
+    First calendar day of each period key returned by ``period_keys``.
+    """
+    if interval == "weekly":
+        return (keys * 7 - 3).astype("datetime64[D]")
+    unit = "datetime64[M]" if interval == "monthly" else "datetime64[Y]"
+    return keys.astype(unit).astype("datetime64[D]")
+
+
+class Rollup:
+    """
+    OHLCV bars of one interval over the first ``rows`` daily rows of a series.
+
+    Open is the first open, high the max high, low the min low, close and adj
+    close the last ones and volume the sum; missing (NaN) highs and lows are
+    skipped. ``starts`` holds the first daily row of every bar.
+    """
+
+    __slots__ = ("interval", "rows", "starts", "period_starts", "first_dates", "last_dates", "columns", "series")
+
+    def __init__(self, interval, rows, starts, period_starts, first_dates, last_dates, columns):
+        self.interval = interval
+        self.rows = rows
+        self.starts = starts
+        self.period_starts = period_starts
+        self.first_dates = first_dates
+        self.last_dates = last_dates
+        self.columns = columns
+        # Coarse PriceSeries over these bars, created on first use by PriceSeries.coarse
+        self.series = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def _aggregate(interval: str, dates: np.ndarray, columns: Dict[str, np.ndarray], offset: int) -> Rollup:
+    n = len(dates)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return Rollup(
+            interval, offset, empty, dates[:0], dates[:0], dates[:0], {name: column[:0] for name, column in columns.items()}
+        )
+
+    keys = period_keys(dates, interval)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], n) - 1
+    bars = {
+        "open_price": columns["open_price"][starts],
+        "high_price": np.fmax.reduceat(columns["high_price"], starts),
+        "low_price": np.fmin.reduceat(columns["low_price"], starts),
+        "close_price": columns["close_price"][ends],
+        "adj_close_price": columns["adj_close_price"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+    return Rollup(
+        interval, offset + n, starts + offset, period_starts(keys[starts], interval), dates[starts], dates[ends], bars
+    )
+
+
+def build_rollup(interval: str, dates: np.ndarray, columns: Dict[str, np.ndarray]) -> Rollup:
+    return _aggregate(interval, dates, columns, 0)
+
+
+def extend_rollup(rollup: Rollup, dates: np.ndarray, columns: Dict[str, np.ndarray]) -> Rollup:
+    """
+    Return ``rollup`` caught up with rows appended to its series since it was built.
+
+    Only the last bar, which the new rows may extend, and the new bars are
+    aggregated, so the cost is proportional to the appended rows plus one period.
+    """
+    if len(rollup) == 0:
+        return build_rollup(rollup.interval, dates, columns)
+
+    tail = int(rollup.starts[-1])
+    update = _aggregate(
+        rollup.interval, dates[tail:], {name: column[tail:] for name, column in columns.items()}, tail
+    )
+    return Rollup(
+        rollup.interval,
+        update.rows,
+        np.concatenate((rollup.starts[:-1], update.starts)),
+        np.concatenate((rollup.period_starts[:-1], update.period_starts)),
+        np.concatenate((rollup.first_dates[:-1], update.first_dates)),
+        np.concatenate((rollup.last_dates[:-1], update.last_dates)),
+        {name: np.concatenate((rollup.columns[name][:-1], update.columns[name])) for name in rollup.columns},
+    )
+
+
+class RollupSlot:
+    """
+    Lazily built rollups shared by every PriceSeries published from the same
+    rows, one per interval. Series that have grown since the last request are
+    caught up with ``extend_rollup``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rollups: Dict[str, Rollup] = {}
+
+    def get(self, interval: str, dates: np.ndarray, columns: Dict[str, np.ndarray]) -> Rollup:
+        n = len(dates)
+        rollup: Optional[Rollup] = self._rollups.get(interval)
+        if rollup is not None and rollup.rows == n:
+            return rollup
+
+        with self._lock:
+            rollup = self._rollups.get(interval)
+            if rollup is None:
+                rollup = build_rollup(interval, dates, columns)
+            elif rollup.rows < n:
+                rollup = extend_rollup(rollup, dates, columns)
+            elif rollup.rows > n:
+                # An older, shorter snapshot of the series; not worth caching
+                return build_rollup(interval, dates, columns)
+            self._rollups[interval] = rollup
+        return rollup
@@ -1,50 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.schemas import Stock, StockCreate, StockPriceCreate, StockPricesAnalysisResponse
+from typing import List, Optional
+from app.database import ReadSessionLocal, call_with_session, get_read_db, get_write_db
+from app.cache import analysis_cache
+from app.executor import analysis_executor
+from app.export import EXPORT_MEDIA_TYPES, parse_columns, stream_export
+from app.bulk import SUPPORTED_MEDIA_TYPES, BulkFormatError, write_bulk_prices
+from app.models import Stock as StockModel
+from app.responses import FastJSONResponse
+from app.versions import PRICES, STOCKS, DataVersions, current_versions, not_modified, ticker_prices
+from app.schemas import (
+    Stock,
+    StockCreate,
+    StockPriceCreate,
+    StockPricesAnalysisResponse,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
+    BulkWriteResponse,
+    OHLCBar,
+    IndicatorPoint,
+    CorrelationResponse,
+    ScreenerWindow,
+    MAX_TRANSACTIONS,
+)
 from app.crud import (
     create_stock,
     get_stock_by_id,
-    get_all_stocks,
+    get_all_stock_rows,
     update_stock,
     delete_stock,
     create_stock_price,
+    get_stock_by_ticker,
+    get_ohlc_bars,
+    get_indicator,
+    get_return_correlations,
     analyze_stock_prices,
+    analyze_stock_prices_batch,
+    screen_windows,
 )
 
 router = APIRouter()
 
 # CRUD operations for Stocks
 @router.post("/api/stocks", response_model=Stock)
-def create_stock_entry(stock: StockCreate, db: Session = Depends(get_db)):
+def create_stock_entry(stock: StockCreate, db: Session = Depends(get_write_db)):
     """
     Create a new stock entry.
     """
-    return create_stock(db, stock)
+    return create_stock(db, StockModel(**stock.dict()))
 
 
 @router.get("/api/stocks/{stock_id}", response_model=Stock)
-def get_stock_entry(stock_id: int, db: Session = Depends(get_db)):
+def get_stock_entry(
+    stock_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    versions: DataVersions = Depends(current_versions),
+):
     """
     Retrieve a specific stock by its ID.
     """
+    etag = versions.etag(STOCKS)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
     stock = get_stock_by_id(db, stock_id)
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
+    response.headers["ETag"] = etag
     return stock
 
 
 @router.get("/api/stocks", response_model=List[Stock])
-def list_stocks(db: Session = Depends(get_db)):
+def list_stocks(
+    request: Request, db: Session = Depends(get_read_db), versions: DataVersions = Depends(current_versions)
+):
     """
     List all stocks in the database.
     """
-    return get_all_stocks(db)
+    etag = versions.etag(STOCKS)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    return FastJSONResponse(get_all_stock_rows(db), headers={"ETag": etag})
 
 
 @router.put("/api/stocks/{stock_id}", response_model=Stock)
-def update_stock_entry(stock_id: int, stock_data: StockCreate, db: Session = Depends(get_db)):
+def update_stock_entry(stock_id: int, stock_data: StockCreate, db: Session = Depends(get_write_db)):
     """
     Update a specific stock by its ID.
     """
@@ -55,19 +100,231 @@ def update_stock_entry(stock_id: int, stock_data: StockCreate, db: Session = Dep
 
 
 @router.delete("/api/stocks/{stock_id}", status_code=204)
-def delete_stock_entry(stock_id: int, db: Session = Depends(get_db)):
+def delete_stock_entry(stock_id: int, db: Session = Depends(get_write_db)):
     """
     Delete a specific stock by its ID.
     """
     delete_stock(db, stock_id)
 
 
-# Analyze stock prices
+# Analyze stock prices; heavy routes run on the bounded analysis executor, not the shared threadpool
 @router.get("/api/stockprices", response_model=StockPricesAnalysisResponse)
-def analyze_stock_prices_route(
-    ticker_symbol: str, start_date: str, end_date: str, db: Session = Depends(get_db)
+async def analyze_stock_prices_route(
+    request: Request,
+    ticker_symbol: str,
+    start_date: str,
+    end_date: str,
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of better companies to return"),
+    resolution: Optional[str] = Query(
+        None, pattern="^(weekly|monthly|yearly)$", description="Analyze weekly, monthly or yearly closes instead of daily ones"
+    ),
+    max_transactions: Optional[int] = Query(
+        None, ge=1, le=MAX_TRANSACTIONS, description="Add the best plan of at most this many buy/sell round trips"
+    ),
+    fee: float = Query(0.0, ge=0, description="Cost of every round trip in the trading plan"),
+    cooldown: int = Query(0, ge=0, description="Rows to wait after a sell before the next buy in the trading plan"),
+    versions: DataVersions = Depends(current_versions),
 ):
     """
     Analyze stock prices for a specific ticker symbol and date range.
     """
-    return analyze_stock_prices(db, ticker_symbol, start_date, end_date)
+    # The better-companies ranking reads every stock, so any price or stock write changes the result
+    etag = versions.etag(STOCKS, PRICES)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    key = analysis_cache.key(ticker_symbol, start_date, end_date, limit, resolution)
+    if max_transactions is not None:
+        key = analysis_cache.key(ticker_symbol, start_date, end_date, limit, resolution, max_transactions, fee, cooldown)
+    result = await analysis_cache.get_or_compute_async(
+        key,
+        lambda: analysis_executor.run(
+            call_with_session, analyze_stock_prices, ticker_symbol, start_date, end_date, limit,
+            resolution=resolution, max_transactions=max_transactions, fee=fee, cooldown=cooldown,
+        ),
+    )
+    return FastJSONResponse(result, headers={"ETag": etag})
+
+
+@router.post("/api/stockprices/batch", response_model=BatchAnalysisResponse, dependencies=[Depends(current_versions)])
+async def analyze_stock_prices_batch_route(request: BatchAnalysisRequest):
+    """
+    Analyze many ticker and date range windows in one request.
+    """
+    items = [(item.ticker_symbol, item.start_date, item.end_date) for item in request.items]
+    outcomes = await analysis_executor.run(
+        call_with_session, analyze_stock_prices_batch, items, request.include_better_companies, request.limit
+    )
+    return FastJSONResponse(
+        {
+            "results": [
+                {
+                    "ticker_symbol": ticker_symbol,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "result": outcome.get("result"),
+                    "error": outcome.get("error"),
+                }
+                for (ticker_symbol, start_date, end_date), outcome in zip(items, outcomes)
+            ]
+        }
+    )
+
+
+# Correlation of daily returns across stocks
+@router.get("/api/stockprices/correlation", response_model=CorrelationResponse, dependencies=[Depends(current_versions)])
+async def get_correlation(
+    start_date: date,
+    end_date: date,
+    tickers: Optional[str] = Query(None, description="Comma-separated tickers to include (default: all)"),
+    min_periods: int = Query(2, ge=2, description="Fewest common return days for a pair to get a value"),
+):
+    """
+    Covariance and correlation matrices of daily log returns over a date range.
+    """
+    selected = sorted({ticker.strip() for ticker in tickers.split(",") if ticker.strip()}) if tickers else None
+    # Keyed under no ticker: price writes overlapping the window and changes to listed stocks invalidate it
+    key = analysis_cache.key(
+        "*", start_date.isoformat(), end_date.isoformat(), "correlation", tuple(selected or ()), min_periods
+    )
+    result = await analysis_cache.get_or_compute_async(
+        key,
+        lambda: analysis_executor.run(
+            call_with_session, get_return_correlations, start_date, end_date, selected, min_periods
+        ),
+    )
+    return FastJSONResponse(result)
+
+
+# Bulk write stock prices
+@router.post("/api/stockprices/bulk", response_model=BulkWriteResponse)
+async def bulk_write_stock_prices(
+    request: Request,
+    ticker_symbol: Optional[str] = Query(None, description="Ticker of rows that do not name one, e.g. a data/ CSV file"),
+    db: Session = Depends(get_write_db),
+):
+    """
+    Insert or update stock prices from a JSON array, NDJSON or CSV body, chosen by Content-Type.
+    """
+    media_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if media_type not in SUPPORTED_MEDIA_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {media_type}")
+    try:
+        return await write_bulk_prices(db, request.stream(), media_type, ticker_symbol)
+    except (BulkFormatError, UnicodeDecodeError) as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+# OHLCV rollups
+@router.get("/api/stockprices/{ticker_symbol}/ohlc", response_model=List[OHLCBar])
+def get_ohlc(
+    request: Request,
+    response: Response,
+    ticker_symbol: str,
+    interval: str = Query("monthly", pattern="^(weekly|monthly|yearly)$", description="Bar interval: weekly, monthly or yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    versions: DataVersions = Depends(current_versions),
+):
+    """
+    Weekly, monthly or yearly OHLCV bars of a ticker, optionally limited to bars overlapping a date range.
+    """
+    etag = versions.etag(STOCKS, ticker_prices(ticker_symbol))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    if not get_stock_by_ticker(db, ticker_symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+    response.headers["ETag"] = etag
+    return get_ohlc_bars(db, ticker_symbol, interval, start_date, end_date)
+
+
+# Screen fixed-length periods of every stock
+@router.get("/api/screener", response_model=List[ScreenerWindow], dependencies=[Depends(current_versions)])
+async def screen_windows_route(
+    window: int = Query(..., ge=2, description="Length of the screened periods, in trading days"),
+    metric: str = Query(
+        "max_profit", pattern="^(max_profit|total_profit|return_pct)$", description="Metric periods are ranked by"
+    ),
+    top: int = Query(10, ge=1, le=1000, description="Number of periods to return, overall or per ticker"),
+    per_ticker: bool = Query(False, description="Return the best periods of every ticker instead of overall"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """
+    Find the best periods of a given length across all stocks.
+    """
+    return await analysis_executor.run(
+        call_with_session, screen_windows, window, metric, top, per_ticker, start_date, end_date
+    )
+
+
+# Rolling indicators
+@router.get("/api/stockprices/{ticker_symbol}/indicators", response_model=List[IndicatorPoint])
+def get_indicators(
+    request: Request,
+    ticker_symbol: str,
+    indicator: str = Query(..., pattern="^(sma|ema|volatility|drawdown)$", description="sma, ema, volatility or drawdown"),
+    window: int = Query(20, ge=2, le=10000, description="Rows averaged by sma, ema and volatility"),
+    field: str = Query("close_price", pattern="^(close_price|adj_close_price)$", description="Price column to use"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    versions: DataVersions = Depends(current_versions),
+):
+    """
+    Moving averages, rolling volatility or drawdown of a ticker, optionally limited to a date range.
+    """
+    etag = versions.etag(STOCKS, ticker_prices(ticker_symbol))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    if not get_stock_by_ticker(db, ticker_symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+    return FastJSONResponse(
+        get_indicator(db, ticker_symbol, indicator, window, field, start_date, end_date), headers={"ETag": etag}
+    )
+
+
+# Export price history
+@router.get("/api/stockprices/{ticker_symbol}/export")
+def export_stock_prices(
+    ticker_symbol: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Output format: csv or ndjson"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to export (default: all)"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Stream the price history of a ticker as CSV or NDJSON, ordered by date.
+    """
+    if not get_stock_by_ticker(db, ticker_symbol):
+        raise HTTPException(status_code=404, detail="Stock not found")
+    try:
+        selected = parse_columns(columns)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+    return StreamingResponse(
+        stream_export(ReadSessionLocal, ticker_symbol, selected, format, start_date, end_date),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{ticker_symbol}.{format}"'},
+    )
+
+
+@router.get("/api/cache/stats")
+def analysis_cache_stats():
+    """
+    Hit, miss, eviction and size counters of the analysis result cache.
+    """
+    return analysis_cache.stats()
+
+
+@router.get("/api/executor/stats")
+def analysis_executor_stats():
+    """
+    Queue depth, wait time and outcome counters of the heavy analysis executor.
+    """
+    return analysis_executor.stats()
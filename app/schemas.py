@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional, List, Dict
+from typing import Optional, List
 
 
 # Base schema for Stock
@@ -55,9 +55,137 @@ class StockPrice(StockPriceBase):
         from_attributes = True
 
 
+# Schema for a company that outperformed the analyzed ticker
+class BetterCompany(BaseModel):
+    company_name: str
+    ticker_symbol: str
+    total_profit: float
+
+
+# Schema for the best single trade of a period; all fields are absent when the period has no prices
+class PeriodProfit(BaseModel):
+    buy_date: Optional[date] = None
+    sell_date: Optional[date] = None  # None when no trade is profitable
+    max_profit: Optional[float] = None
+
+
+# Schema for one round trip of a trading plan
+class Trade(BaseModel):
+    buy_date: date
+    sell_date: date
+    buy_price: float
+    sell_price: float
+    profit: float  # Net of the fee
+
+
+# Schema for the best plan of at most max_transactions round trips
+class TradingPlan(BaseModel):
+    max_transactions: int
+    fee: float
+    cooldown: int
+    profit: float
+    trades: List[Trade]
+
+
+# Schema for the analyzed period itself
+class RequestedPeriod(PeriodProfit):
+    total_profit: Optional[float] = None
+    trading_plan: Optional[TradingPlan] = None  # Only present when max_transactions is given
+
+
 # Schema for the response of analyzed stock prices
 class StockPricesAnalysisResponse(BaseModel):
-    requested_period: Dict
-    before_period: Dict
-    after_period: Dict
-    better_companies: List[str]  # List of better-performing companies in the same period
+    requested_period: RequestedPeriod
+    before_period: PeriodProfit
+    after_period: PeriodProfit
+    better_companies: List[str]  # List of better-performing companies in the same period, most profitable first
+    better_companies_ranking: List[BetterCompany] = []  # Same companies with their total profit
+
+
+# Largest number of round trips a trading plan may be asked for
+MAX_TRANSACTIONS = 100
+
+
+# Maximum number of windows accepted by one batch analysis request
+MAX_BATCH_ITEMS = 10000
+
+
+# Schema for one window of a batch analysis request
+class AnalysisRequestItem(BaseModel):
+    ticker_symbol: str = Field(..., max_length=10)
+    start_date: str
+    end_date: str
+
+
+# Schema for a batch analysis request
+class BatchAnalysisRequest(BaseModel):
+    items: List[AnalysisRequestItem] = Field(..., max_length=MAX_BATCH_ITEMS)
+    include_better_companies: bool = True  # Skip the cross-ticker comparison when False
+    limit: Optional[int] = Field(None, ge=1)  # Maximum number of better companies per item
+
+
+# Schema for the outcome of one window; exactly one of result and error is set
+class BatchAnalysisResult(AnalysisRequestItem):
+    result: Optional[StockPricesAnalysisResponse] = None
+    error: Optional[str] = None
+
+
+# Schema for the response of a batch analysis, in request order
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchAnalysisResult]
+
+
+# Schema for a rejected row of a bulk price write
+class BulkRowError(BaseModel):
+    line: int  # Line of an NDJSON/CSV body, or 1-based position in a JSON array
+    error: str
+
+
+# Schema for the outcome of a bulk price write
+class BulkWriteResponse(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    superseded: int  # Replaced by a later row of the body with the same ticker_symbol and date before being written
+    rejected: int  # received == inserted + updated + superseded + rejected
+    errors: List[BulkRowError]  # The first rejected rows, at most MAX_REPORTED_ERRORS
+
+
+# Schema for a weekly, monthly or yearly OHLCV bar
+class OHLCBar(BaseModel):
+    period_start: date  # First calendar day of the week (Monday), month or year
+    first_date: date  # First trading day in the period
+    last_date: date  # Last trading day in the period
+    open_price: Optional[float] = None
+    high_price: Optional[float] = None
+    low_price: Optional[float] = None
+    close_price: Optional[float] = None
+    adj_close_price: Optional[float] = None
+    volume: int
+
+
+# Schema for one period returned by the screener
+class ScreenerWindow(BaseModel):
+    ticker_symbol: str
+    company_name: str
+    start_date: date
+    end_date: date
+    value: float  # Metric of the period: max profit, total profit or return in percent
+    buy_date: Optional[date] = None  # Best single trade, for the max_profit metric
+    sell_date: Optional[date] = None
+
+
+# Schema for one point of an indicator series
+class IndicatorPoint(BaseModel):
+    date: date
+    value: float
+
+
+# Schema for the return correlation matrices; rows and columns follow tickers
+class CorrelationResponse(BaseModel):
+    start_date: date
+    end_date: date
+    tickers: List[str]
+    observations: List[List[int]]  # Days on which both tickers have a return
+    covariance: List[List[Optional[float]]]  # Of daily log returns; None with too few common days
+    correlation: List[List[Optional[float]]]
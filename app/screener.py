@@ -0,0 +1,87 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app import kernels
+
+# Per-window metric kernels, by metric name
+SCREENER_METRICS = {
+    "max_profit": kernels.window_max_profit,
+    "total_profit": kernels.window_total_profit,
+    "return_pct": kernels.window_return_pct,
+}
+
+# Worker processes used for large screens; 1 keeps all work in the calling thread
+SCREENER_WORKERS = int(os.getenv("SCREENER_WORKERS", str(os.cpu_count() or 1)))
+
+# Screens over fewer rows than this are cheaper to run in-process than to ship to workers
+SCREENER_PARALLEL_MIN_ROWS = int(os.getenv("SCREENER_PARALLEL_MIN_ROWS", "500000"))
+
+# (window start rows, metric values) of the best windows of one ticker, best first
+Ranked = Tuple[np.ndarray, np.ndarray]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def top_windows(closes: np.ndarray, window: int, metric: str, top: int) -> Ranked:
+    """
+    Rank every ``window``-row slice of ``closes`` by ``metric`` and return the best ``top``.
+
+    Ties keep the earliest window first; windows whose metric is undefined
+    (NaN) are never returned.
+    """
+    values = SCREENER_METRICS[metric](closes, window)
+    ranked = np.where(np.isnan(values), -np.inf, values)
+    valid = np.flatnonzero(ranked > -np.inf)
+    if len(valid) > top:
+        cutoff = np.partition(ranked[valid], len(valid) - top)[len(valid) - top]
+        above = valid[ranked[valid] > cutoff]
+        tied = valid[ranked[valid] == cutoff]
+        valid = np.concatenate((above, tied[: top - len(above)]))
+
+    order = np.lexsort((valid, -ranked[valid]))
+    starts = valid[order]
+    return starts, values[starts]
+
+
+def _screen_chunk(chunk: List[Tuple[str, np.ndarray]], window: int, metric: str, top: int) -> List[Tuple[str, Ranked]]:
+    return [(ticker_symbol, top_windows(closes, window, metric, top)) for ticker_symbol, closes in chunk]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned rather than forked: the server process runs threads
+            _executor = ProcessPoolExecutor(SCREENER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def screen(closes_by_ticker: Dict[str, np.ndarray], window: int, metric: str, top: int) -> Dict[str, Ranked]:
+    """
+    Return the ``top`` windows of every ticker, keyed like ``closes_by_ticker``.
+
+    The best ``top`` windows overall are always among the per-ticker ones, so
+    callers can merge these lists for a global ranking. Large screens are split
+    into chunks of tickers and spread over a process pool.
+    """
+    items = list(closes_by_ticker.items())
+    rows = sum(len(closes) for _, closes in items)
+    if SCREENER_WORKERS <= 1 or len(items) < 2 or rows < SCREENER_PARALLEL_MIN_ROWS:
+        return dict(_screen_chunk(items, window, metric, top))
+
+    # A few chunks per worker evens out tickers of different lengths
+    chunk_count = min(len(items), SCREENER_WORKERS * 4)
+    chunks = [items[number::chunk_count] for number in range(chunk_count)]
+    executor = _get_executor()
+    futures = [executor.submit(_screen_chunk, chunk, window, metric, top) for chunk in chunks]
+
+    ranked = {}
+    for future in futures:
+        ranked.update(future.result())
+    return {ticker_symbol: ranked[ticker_symbol] for ticker_symbol, _ in items}
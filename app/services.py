@@ -1,4 +1,5 @@
 from typing import List, Dict, Optional
+from app import kernels
 from app.models import StockPrice
 from datetime import date, timedelta
 
@@ -11,25 +12,14 @@ class ProfitAnalyzer:
         if not prices:
             return None
 
-        min_price = float('inf')
-        max_profit = 0
-        buy_date = None
-        sell_date = None
-
-        for price in prices:
-            if price.close_price < min_price:
-                min_price = price.close_price
-                buy_date = price.date
-
-            profit = price.close_price - min_price
-            if profit > max_profit:
-                max_profit = profit
-                sell_date = price.date
+        closes = [price.close_price for price in prices]
+        buy_index, sell_index, max_profit = kernels.max_profit(closes)
+        min_price = closes[buy_index] if buy_index is not None else float('inf')
 
         return {
-            "buy_date": buy_date,
+            "buy_date": prices[buy_index].date if buy_index is not None else None,
             "buy_price": min_price,
-            "sell_date": sell_date,
+            "sell_date": prices[sell_index].date if sell_index is not None else None,
             "sell_price": min_price + max_profit,
             "max_profit": max_profit,
         }
@@ -39,12 +29,7 @@ class ProfitAnalyzer:
         """
         Calculate the total profit for multiple trades in the given prices.
         """
-        total_profit = 0
-        for i in range(1, len(prices)):
-            profit = prices[i].close_price - prices[i - 1].close_price
-            if profit > 0:
-                total_profit += profit
-        return total_profit
+        return kernels.total_profit([price.close_price for price in prices])
 
     @staticmethod
     def get_adjacent_periods(
@@ -0,0 +1,268 @@
+import os
+import csv
+import json
+import logging
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.price_store import PRICE_COLUMNS, read_price_arrays
+from app.versions import PRICES, read_versions
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the on-disk layout changes
+FORMAT_VERSION = 1
+
+# Name of the file holding the current version directory
+POINTER_FILE = "CURRENT"
+
+# Number of snapshot versions kept after a rebuild
+SNAPSHOT_KEEP = int(os.getenv("PRICE_SNAPSHOT_KEEP", "2"))
+
+# On-disk type of every column; dates are days since 1970-01-01
+COLUMN_DTYPES = {"date": np.dtype("<i4"), **{name: np.dtype("<f8") for name in PRICE_COLUMNS}}
+COLUMN_DTYPES["volume"] = np.dtype("<i8")
+
+PriceArrays = Dict[str, Tuple[np.ndarray, Dict[str, np.ndarray]]]
+
+
+def _pad(offset: int) -> int:
+    # Keep every column 8-byte aligned
+    return (offset + 7) & ~7
+
+
+def _write_ticker_file(path: str, dates: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, int]:
+    """
+    Write one ticker's columns back to back and return the byte offset of each.
+    """
+    offsets = {}
+    with open(path, "wb") as file:
+        for name, dtype in COLUMN_DTYPES.items():
+            values = dates.astype("datetime64[D]").astype(np.int64) if name == "date" else columns[name]
+            file.write(b"\0" * (_pad(file.tell()) - file.tell()))
+            offsets[name] = file.tell()
+            file.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+    return offsets
+
+
+def write_snapshot(root: str, arrays: PriceArrays, source: str, data_version: int) -> str:
+    """
+    Write a new snapshot version under ``root`` and make it current.
+
+    ``data_version`` is the prices data version (see ``app.versions``) the
+    arrays were read at. The version is assembled in a staging directory, renamed into place and
+    then published by atomically replacing the ``CURRENT`` pointer, so readers
+    always see either the old or the new version in full. Returns the version name.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = datetime.utcnow().strftime("v%Y%m%dT%H%M%S%f")
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+    try:
+        tickers = {}
+        for number, (symbol, (dates, columns)) in enumerate(sorted(arrays.items())):
+            if len(dates) == 0:
+                continue
+            file_name = f"{number:05d}.bin"
+            offsets = _write_ticker_file(os.path.join(staging, file_name), dates, columns)
+            tickers[symbol] = {"file": file_name, "rows": len(dates), "offsets": offsets}
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "source": source,
+            "rows": sum(entry["rows"] for entry in tickers.values()),
+            "data_version": data_version,
+            "columns": {name: dtype.str for name, dtype in COLUMN_DTYPES.items()},
+            "tickers": tickers,
+        }
+        with open(os.path.join(staging, "manifest.json"), "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.rename(staging, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, POINTER_FILE)
+    with open(pointer + ".tmp", "w") as file:
+        file.write(version)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(pointer + ".tmp", pointer)
+
+    prune_snapshots(root, keep=SNAPSHOT_KEEP)
+    return version
+
+
+def prune_snapshots(root: str, keep: int = SNAPSHOT_KEEP) -> None:
+    """
+    Delete all but the newest ``keep`` versions. Processes still mapping a deleted
+    version keep reading it until they reload; POSIX frees the pages afterwards.
+    """
+    current = current_version(root)
+    versions = sorted(name for name in os.listdir(root) if name.startswith("v"))
+    for name in versions[: max(0, len(versions) - keep)]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def current_version(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, POINTER_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(root: str, version: Optional[str] = None) -> Optional[Dict]:
+    version = version or current_version(root)
+    if version is None:
+        return None
+    with open(os.path.join(root, version, "manifest.json")) as file:
+        manifest = json.load(file)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {version}")
+    return manifest
+
+
+def open_snapshot(root: str, version: Optional[str] = None) -> Tuple[Dict, PriceArrays]:
+    """
+    Map every ticker file of a snapshot read-only and return (manifest, arrays).
+
+    Price and volume columns are zero-copy views of the mapping, shared through
+    the page cache by every process that opens the same version. Dates are
+    widened to ``datetime64[D]`` in memory, which costs 8 bytes per row.
+    """
+    manifest = read_manifest(root, version)
+    if manifest is None:
+        raise FileNotFoundError(f"No price snapshot in {root}")
+
+    directory = os.path.join(root, manifest["version"])
+    arrays = {}
+    for symbol, entry in manifest["tickers"].items():
+        mapped = np.memmap(os.path.join(directory, entry["file"]), dtype=np.uint8, mode="r")
+        rows, offsets = entry["rows"], entry["offsets"]
+        columns = {
+            name: np.frombuffer(mapped, dtype=dtype, count=rows, offset=offsets[name])
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+        dates = columns.pop("date").astype("datetime64[D]")
+        arrays[symbol] = (dates, columns)
+    return manifest, arrays
+
+
+def open_current_snapshot(root: str, db: Session) -> Optional[PriceArrays]:
+    """
+    Open the current snapshot if it matches the ``stock_prices`` table, else return None.
+
+    Every write to stock_prices bumps the prices data version, so a snapshot
+    built at another version is ignored instead of serving stale prices.
+    """
+    try:
+        manifest, arrays = open_snapshot(root)
+    except (FileNotFoundError, ValueError) as error:
+        logger.warning("price snapshot unavailable, reading prices from the database: %s", error)
+        return None
+
+    data_version = read_versions(db, [PRICES])[PRICES]
+    if manifest.get("data_version") != data_version:
+        logger.warning(
+            "price snapshot version=%s data_version=%s does not match table data_version=%d, reading prices from the database",
+            manifest["version"], manifest.get("data_version"), data_version,
+        )
+        return None
+    return arrays
+
+
+def snapshot_matches(root: str, db: Session) -> bool:
+    """
+    Return True if the current snapshot was built at the table's prices data version.
+    """
+    try:
+        manifest = read_manifest(root)
+    except (FileNotFoundError, ValueError):
+        return False
+    return manifest is not None and manifest.get("data_version") == read_versions(db, [PRICES])[PRICES]
+
+
+def build_from_db(db: Session, root: str) -> str:
+    # The version is read first, so a write racing the build makes the snapshot look older, never newer
+    data_version = read_versions(db, [PRICES])[PRICES]
+    return write_snapshot(root, read_price_arrays(db), source="database", data_version=data_version)
+
+
+def build_from_csv(db: Session, root: str, csv_directory_path: str) -> str:
+    """
+    Build a snapshot straight from CSV files. The stocks table maps file names to
+    tickers, as in init_db; duplicate dates keep their first row. The snapshot
+    is stamped with the table's current prices data version, so it is only
+    served if the files hold what the table holds.
+    """
+    # Imported here because app.init_db depends on the price store
+    from app.init_db import find_stock_for_file, parse_price_rows
+
+    data_version = read_versions(db, [PRICES])[PRICES]
+
+    arrays = {}
+    for filename in sorted(os.listdir(csv_directory_path)):
+        if not filename.endswith(".csv"):
+            continue
+        file_path = os.path.join(csv_directory_path, filename)
+        stock = find_stock_for_file(db, file_path)
+        if not stock:
+            continue
+
+        with open(file_path, mode="r", newline="") as csv_file:
+            csv_reader = csv.reader(csv_file)
+            next(csv_reader, None)  # Skip header row
+            parsed, _ = parse_price_rows(list(csv_reader))
+        if not parsed:
+            continue
+
+        dates = np.array([row["date"] for row in parsed], dtype="datetime64[D]")
+        _, first = np.unique(dates, return_index=True)
+        arrays[stock.ticker_symbol] = (
+            dates[first],
+            {
+                name: np.array([row[name] for row in parsed], dtype=COLUMN_DTYPES[name])[first]
+                for name in PRICE_COLUMNS
+            },
+        )
+    return write_snapshot(
+        root, arrays, source=f"csv:{os.path.realpath(csv_directory_path)}", data_version=data_version
+    )
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Build or inspect memory-mapped price snapshots.")
+    parser.add_argument("command", choices=("build", "info"))
+    parser.add_argument("--dir", default=os.getenv("PRICE_SNAPSHOT_DIR", "./snapshots"), help="Snapshot root directory (default: $PRICE_SNAPSHOT_DIR or ./snapshots)")
+    parser.add_argument("--csv-directory", default=None, help="Build from CSV files instead of the stock_prices table")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        manifest = read_manifest(args.dir)
+        if manifest is None:
+            print(f"No price snapshot in {args.dir}")
+        else:
+            print(f"{manifest['version']}: {manifest['rows']} rows, {len(manifest['tickers'])} tickers from {manifest['source']}")
+    else:
+        db = SessionLocal()
+        try:
+            if args.csv_directory:
+                version = build_from_csv(db, args.dir, args.csv_directory)
+            else:
+                version = build_from_db(db, args.dir)
+        finally:
+            db.close()
+        print(f"Built price snapshot {version} in {args.dir}")
@@ -0,0 +1,215 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import ReadSessionLocal
+from app.models import DataVersion
+
+# Rows of the data_versions table: the stocks table, all prices, and the prices of one ticker
+STOCKS = "stocks"
+PRICES = "prices"
+TICKER_PRICES_PREFIX = "prices:"
+
+# Session.info key of the versions a transaction has bumped
+_BUMPED = "bumped_data_versions"
+
+
+def ticker_prices(ticker_symbol: str) -> str:
+    return TICKER_PRICES_PREFIX + ticker_symbol
+
+
+def price_version_names(ticker_symbols: Iterable[str]) -> List[str]:
+    """
+    Return the versions a write to the prices of ``ticker_symbols`` changes.
+    """
+    return [PRICES] + [ticker_prices(ticker_symbol) for ticker_symbol in ticker_symbols]
+
+
+def bump_versions(db: Session, names: Iterable[str]) -> None:
+    """
+    Increment the named data versions in the session's open transaction.
+
+    Call it before the commit of every write, so the versions change exactly
+    when the written rows become visible to other processes; this process
+    sees the new versions once the commit succeeds. Rows are updated in name
+    order, which keeps concurrent writers from deadlocking.
+    """
+    names = sorted(set(names))
+    stmt = _bump_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, [{"name": name, "version": 1} for name in names])
+    else:
+        # Portable fallback: bump the rows that exist, create the rest
+        db.execute(update(DataVersion).where(DataVersion.name.in_(names)).values(version=DataVersion.version + 1))
+        existing = set(db.execute(select(DataVersion.name).where(DataVersion.name.in_(names))).scalars())
+        db.add_all(DataVersion(name=name, version=1) for name in names if name not in existing)
+        db.flush()
+    db.info.setdefault(_BUMPED, {}).update(read_versions(db, names))
+
+
+def bump_all_price_versions(db: Session) -> None:
+    """
+    Increment the price versions of every ticker, for writes that replace all prices.
+    """
+    db.execute(
+        update(DataVersion)
+        .where(DataVersion.name.startswith(TICKER_PRICES_PREFIX, autoescape=True))
+        .values(version=DataVersion.version + 1)
+    )
+    bump_versions(db, [PRICES])
+    db.info.setdefault(_BUMPED, {}).update(read_versions(db))
+
+
+def read_versions(db: Session, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Return {name: version} of the named data versions, or of all of them; missing rows are 0.
+    """
+    stmt = select(DataVersion.name, DataVersion.version)
+    if names is not None:
+        names = list(names)
+        stmt = stmt.where(DataVersion.name.in_(names))
+    versions = dict(db.execute(stmt).all())
+    return {name: versions.get(name, 0) for name in names} if names is not None else versions
+
+
+def _bump_statement(dialect_name: str):
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect_name == "sqlite" else postgresql.insert)(DataVersion)
+        return stmt.on_conflict_do_update(
+            index_elements=[DataVersion.name], set_={"version": DataVersion.version + 1}
+        )
+    if dialect_name in ("mysql", "mariadb"):
+        return mysql.insert(DataVersion).on_duplicate_key_update(version=DataVersion.version + 1)
+    return None
+
+
+class DataVersions:
+    """
+    This process's view of the data_versions table, from which ETags are built.
+
+    ``current`` re-reads the table once the last read is more than
+    ``poll_seconds`` old, so writes committed by other processes are seen
+    within that delay; writes committed by this process are seen at once.
+    Versions that went up for any other reason than a write of this process
+    are passed to the listeners registered with ``add_listener``, which drop
+    state derived from the old data.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._polled_at: Optional[float] = None
+        self._listeners: List[Callable[[List[str]], None]] = []
+
+    def add_listener(self, listener: Callable[[List[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def _poll_due(self) -> bool:
+        return self._polled_at is None or time.monotonic() - self._polled_at >= self.poll_seconds
+
+    def current(self) -> "DataVersions":
+        """
+        Return self, after re-reading the table if the last read is too old.
+        """
+        if self._poll_due():
+            # Waiters block rather than serve versions older than what they go on to read
+            with self._poll_lock:
+                if self._poll_due():
+                    self.refresh()
+        return self
+
+    def refresh(self) -> None:
+        db = self._session_factory()
+        try:
+            versions = read_versions(db)
+        finally:
+            db.close()
+        self._polled_at = time.monotonic()
+        self._apply(versions, local=False)
+
+    def committed(self, versions: Dict[str, int]) -> None:
+        """
+        Record the versions bumped by a transaction of this process that has just committed.
+        """
+        self._apply(versions, local=True)
+
+    def _apply(self, versions: Dict[str, int], local: bool) -> None:
+        changed = []
+        with self._lock:
+            for name, version in versions.items():
+                known = self._versions.get(name, 0)
+                if version <= known:
+                    # Older than what this process has seen, e.g. read from a lagging replica
+                    continue
+                self._versions[name] = version
+                # A local write moving a version by exactly one leaves nothing unseen behind it
+                if not (local and version == known + 1):
+                    changed.append(name)
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+
+    def etag(self, *names: str) -> str:
+        """
+        Return a strong ETag for a response built from the named data versions.
+
+        Take the ETag before reading the data, so a write racing the read can
+        only make it older than the body.
+        """
+        versions = tuple((name, self.get(name)) for name in names)
+        digest = hashlib.blake2b(repr(versions).encode(), digest_size=12).hexdigest()
+        return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the request's If-None-Match header lists ``etag``, else None.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# Seconds between reads of the data_versions table (DATA_VERSION_POLL_SECONDS); 0 reads it on every request
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "1"))
+
+# Shared view of the data versions, read through the read engines
+data_versions = DataVersions(ReadSessionLocal, DATA_VERSION_POLL_SECONDS)
+
+
+def current_versions() -> DataVersions:
+    """
+    Dependency returning the data versions, re-read from the database when due.
+    """
+    return data_versions.current()
+
+
+# Versions bumped by a session are published once its transaction commits
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    versions = session.info.pop(_BUMPED, None)
+    if versions:
+        data_versions.committed(versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_BUMPED, None)
@@ -0,0 +1,411 @@
+"""
+Reproducible benchmarks of the price kernels, the CSV loader, the analysis
+functions, response serialization and the HTTP routes, run against synthetic data.
+
+    python -m benchmarks.run --tickers 5 --days 10000 --output results.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --fail-on-regression
+
+By default a throwaway SQLite database is generated in --workdir, so no MySQL
+is needed; pass --database-url to benchmark an existing database instead.
+
+benchmarks/baseline.json holds a run with the default options on a 1-vCPU
+x86_64 Linux VM ("Intel(R) Xeon(R) Processor", Python 3.11); its "meta" names
+the CPU and platform of the recording. On that VM, repeated runs of one commit
+differ by up to about 40% on the sub-millisecond kernel benchmarks, so treat
+--fail-on-regression against it as a coarse check. Timings depend on the
+machine, so before comparing on another one, record a baseline there from the
+commit to compare against with --save-baseline.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SUITES = ("kernels", "loader", "analysis", "serialization", "routes")
+
+# Window lengths, in calendar days, of the generated analysis requests
+WINDOW_DAYS = (7, 30, 365, 3650)
+
+# Options that only say where this run reads and writes or how it compares,
+# left out of the recorded metadata
+RUN_LOCAL_OPTIONS = ("database_url", "workdir", "output", "baseline", "save_baseline", "tolerance", "fail_on_regression")
+
+# Metrics compared against the baseline and whether larger values are better
+COMPARED_METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_per_s": True}
+
+
+def summarize(latencies: Sequence[float], wall_seconds: Optional[float] = None) -> Dict:
+    """
+    Latency percentiles in milliseconds and throughput of a list of per-call timings.
+    """
+    values = np.asarray(latencies, dtype=np.float64) * 1000.0
+    wall_seconds = wall_seconds if wall_seconds is not None else float(np.sum(latencies))
+    return {
+        "count": len(values),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "throughput_per_s": len(values) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+def timed(call: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started
+
+
+def measure(call: Callable[[], object], repeat: int) -> Dict:
+    return summarize([timed(call) for _ in range(repeat)])
+
+
+def measure_concurrent(calls: Sequence[Callable[[], object]], concurrency: int) -> Dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, calls))
+    return {**summarize(latencies, time.perf_counter() - started), "concurrency": concurrency}
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def cpu_model() -> str:
+    """
+    Name of the CPU, read from /proc/cpuinfo where ``platform.processor`` is blank.
+    """
+    try:
+        with open("/proc/cpuinfo") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def analysis_windows(n_tickers: int, n_days: int, count: int, seed: int) -> List[tuple]:
+    """
+    Deterministic (ticker_symbol, start_date, end_date) requests spread over the synthetic histories.
+    """
+    from benchmarks.synthetic import START_DATE
+
+    rng = np.random.default_rng([seed, 1])
+    first = datetime.strptime(START_DATE, "%Y-%m-%d").date()
+    span = int(n_days * 7 / 5)
+    windows = []
+    for _ in range(count):
+        length = int(rng.choice(WINDOW_DAYS))
+        start = first + timedelta(days=int(rng.integers(0, max(1, span - length))))
+        ticker = f"S{int(rng.integers(0, n_tickers)):04d}"
+        windows.append((ticker, start.isoformat(), (start + timedelta(days=length - 1)).isoformat()))
+    return windows
+
+
+def run_kernels(args) -> Dict:
+    from app import kernels
+    from app.range_index import RangeIndex
+    from benchmarks.synthetic import synthetic_prices
+
+    closes = synthetic_prices(0, args.days, args.seed)[1]["close_price"]
+    rng = np.random.default_rng([args.seed, 2])
+    starts = rng.integers(0, args.days - 1, 1000)
+    ends = np.minimum(starts + rng.integers(1, args.days, 1000), args.days)
+    index = RangeIndex(closes)
+
+    def range_queries():
+        for lo, hi in zip(starts.tolist(), ends.tolist()):
+            index.max_profit(lo, hi)
+
+    return {
+        "kernels.max_profit": measure(lambda: kernels.max_profit(closes), args.repeat),
+        "kernels.total_profit": measure(lambda: kernels.total_profit(closes), args.repeat),
+        "kernels.max_profit_batch_1000": measure(lambda: kernels.max_profit_batch(closes, starts, ends), args.repeat),
+        "kernels.total_profit_batch_1000": measure(lambda: kernels.total_profit_batch(closes, starts, ends), args.repeat),
+        "kernels.range_index_build": measure(lambda: RangeIndex(closes), args.repeat),
+        "kernels.range_index_max_profit_1000": measure(range_queries, args.repeat),
+    }
+
+
+def run_loader(args) -> Dict:
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from app.init_db import ingest_csv_file
+    from app.models import Base, Stock
+    from benchmarks.synthetic import synthetic_stocks, write_csv_files
+
+    n_tickers = min(args.tickers, args.loader_tickers)
+    directory = os.path.join(args.workdir, "csv")
+    paths = write_csv_files(directory, n_tickers, args.days, args.seed)
+
+    engine = create_engine(f"sqlite:///{os.path.join(args.workdir, 'loader.db')}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        stocks = synthetic_stocks(n_tickers)
+        db.execute(insert(Stock), stocks)
+        db.commit()
+
+        results = {}
+        for label in ("loader.ingest_csv", "loader.ingest_csv_unchanged"):
+            latencies = [
+                timed(lambda: ingest_csv_file(db, path, stock["ticker_symbol"])) for path, stock in zip(paths, stocks)
+            ]
+            results[label] = {**summarize(latencies), "rows_per_s": n_tickers * args.days / sum(latencies)}
+        return results
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def run_analysis(args) -> Dict:
+    from app.crud import analyze_stock_prices, get_alternative_stocks
+    from app.database import SessionLocal
+    from app.price_store import price_store
+
+    windows = analysis_windows(args.tickers, args.days, args.requests, args.seed)
+    db = SessionLocal()
+    try:
+        price_store.reset()
+        results = {"analysis.store_load": summarize([timed(lambda: price_store.ensure_loaded(db))])}
+        results["analysis.analyze_stock_prices"] = summarize(
+            [timed(lambda: analyze_stock_prices(db, *window)) for window in windows]
+        )
+        results["analysis.get_alternative_stocks"] = summarize(
+            [
+                timed(
+                    lambda: get_alternative_stocks(
+                        db,
+                        ticker,
+                        datetime.strptime(start, "%Y-%m-%d").date(),
+                        datetime.strptime(end, "%Y-%m-%d").date(),
+                        0.0,
+                    )
+                )
+                for ticker, start, end in windows
+            ]
+        )
+        return results
+    finally:
+        db.close()
+
+
+def run_serialization(args) -> Dict:
+    """
+    Encode large list and analysis responses through FastAPI's validated path
+    (validate against the response model, dump in JSON mode, then encode) and
+    through ``FastJSONResponse``, which encodes the plain content directly.
+    """
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from app.responses import FastJSONResponse
+    from app.schemas import Stock, StockPricesAnalysisResponse
+
+    rows = args.serialization_rows
+    stocks = [
+        {
+            "company_name": f"Synthetic Company {number}",
+            "ticker_symbol": f"S{number:05d}",
+            "date_founded": date(1950, 1, 1) + timedelta(days=number),
+            "industry": "Synthetic",
+            "id": number + 1,
+        }
+        for number in range(rows)
+    ]
+    period = {"buy_date": date(2020, 3, 16), "sell_date": date(2020, 8, 31), "max_profit": 57.125}
+    analysis = {
+        "requested_period": {**period, "total_profit": 212.5},
+        "before_period": period,
+        "after_period": {},
+        "better_companies": [stock["company_name"] for stock in stocks],
+        "better_companies_ranking": [
+            {"company_name": stock["company_name"], "ticker_symbol": stock["ticker_symbol"], "total_profit": 300.0 - number / rows}
+            for number, stock in enumerate(stocks)
+        ],
+    }
+
+    results = {}
+    for name, model, content in (("list_stocks", List[Stock], stocks), ("analysis", StockPricesAnalysisResponse, analysis)):
+        adapter = TypeAdapter(model)
+        results[f"serialization.{name}.validated"] = measure(
+            lambda: JSONResponse(adapter.dump_python(adapter.validate_python(content), mode="json")), args.repeat
+        )
+        results[f"serialization.{name}.fast"] = measure(lambda: FastJSONResponse(content), args.repeat)
+    return results
+
+
+def run_routes(args) -> Dict:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    windows = analysis_windows(args.tickers, args.days, args.requests, args.seed)
+    with TestClient(app) as client:
+        def get(url, **params):
+            return lambda: client.get(url, params=params).raise_for_status()
+
+        client.get("/api/stockprices", params=dict(zip(("ticker_symbol", "start_date", "end_date"), windows[0])))
+        return {
+            "routes.analyze": measure_concurrent(
+                [
+                    get("/api/stockprices", ticker_symbol=ticker, start_date=start, end_date=end)
+                    for ticker, start, end in windows
+                ],
+                args.concurrency,
+            ),
+            "routes.list_stocks": measure_concurrent([get("/api/stocks")] * args.requests, args.concurrency),
+            "routes.get_stock": measure_concurrent(
+                [get(f"/api/stocks/{1 + number % args.tickers}") for number in range(args.requests)],
+                args.concurrency,
+            ),
+        }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Print each compared metric against the baseline and return the regressions.
+    """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in metrics or not reference.get(metric):
+                continue
+            ratio = metrics[metric] / reference[metric]
+            regressed = ratio < 1.0 - tolerance if higher_is_better else ratio > 1.0 + tolerance
+            line = f"{name:40s} {metric:18s} {reference[metric]:12.3f} -> {metrics[metric]:12.3f} ({ratio:6.2f}x)"
+            print(line + ("  REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the stock API on synthetic data.")
+    parser.add_argument("--tickers", type=int, default=5, help="Number of synthetic tickers (default: 5)")
+    parser.add_argument("--days", type=int, default=10_000, help="Trading days per ticker (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the data and request generators")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated suites to run (default: {','.join(SUITES)})")
+    parser.add_argument("--requests", type=int, default=500, help="Analysis calls and HTTP requests per benchmark")
+    parser.add_argument("--repeat", type=int, default=50, help="Repetitions of each kernel micro-benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients in the route benchmarks")
+    parser.add_argument("--serialization-rows", type=int, default=10_000, help="Stocks and ranked companies per serialized response (default: 10000)")
+    parser.add_argument("--loader-tickers", type=int, default=20, help="Maximum number of CSV files ingested by the loader benchmark")
+    parser.add_argument("--cache", action="store_true", help="Keep the analysis result cache enabled")
+    parser.add_argument("--database-url", default=None, help="Benchmark an existing database instead of generating one")
+    parser.add_argument("--workdir", default=None, help="Directory for generated databases and CSVs (default: a temporary one)")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous results file")
+    parser.add_argument("--save-baseline", default=None, help="Also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change reported as a regression (default: 0.2)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a regression is found")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    # Checked up front rather than after minutes of benchmarking
+    if args.baseline and not os.path.isfile(args.baseline):
+        parser.error(f"baseline file {args.baseline} not found; record one with --save-baseline {args.baseline}")
+
+    cleanup = args.workdir is None
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="stock-bench-")
+    os.makedirs(args.workdir, exist_ok=True)
+
+    # The app reads its settings at import time, so configure it before importing it
+    database_path = os.path.join(args.workdir, "bench.db")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{database_path}"
+    os.environ["INIT_DB_ON_STARTUP"] = "skip"
+    if not args.cache:
+        os.environ["ANALYSIS_CACHE_MAX_ENTRIES"] = "0"
+
+    try:
+        started_at = datetime.now().isoformat()
+        meta = {
+            **{key: value for key, value in vars(args).items() if key not in RUN_LOCAL_OPTIONS},
+            "database": "external" if args.database_url else "sqlite",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu": cpu_model(),
+            "cpu_count": os.cpu_count(),
+        }
+
+        if args.database_url is None and ({"analysis", "routes"} & set(suites)):
+            from app.database import SessionLocal, engine
+            from app.models import Base
+            from benchmarks.synthetic import populate_database
+
+            if os.path.exists(database_path):
+                os.remove(database_path)
+            Base.metadata.create_all(bind=engine)
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                rows = populate_database(db, args.tickers, args.days, args.seed)
+                print(f"Generated {rows} price rows for {args.tickers} tickers in {time.perf_counter() - started:.1f}s")
+            finally:
+                db.close()
+
+        runners = {
+            "kernels": run_kernels,
+            "loader": run_loader,
+            "analysis": run_analysis,
+            "serialization": run_serialization,
+            "routes": run_routes,
+        }
+        results = {}
+        for suite in suites:
+            started = time.perf_counter()
+            results.update(runners[suite](args))
+            print(f"Finished {suite} benchmarks in {time.perf_counter() - started:.1f}s")
+
+        report = {"meta": meta, "peak_rss_mb": peak_rss_mb(), "results": results}
+        for name, metrics in results.items():
+            print(f"{name:40s} p50 {metrics['p50_ms']:10.3f} ms  p99 {metrics['p99_ms']:10.3f} ms  {metrics['throughput_per_s']:10.1f}/s")
+        print(f"Peak RSS: {report['peak_rss_mb']} MB")
+
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump({**report, "meta": {**meta, "started_at": started_at}}, file, indent=2)
+        # A baseline is committed and compared for a long time, so it keeps no timestamp
+        if args.save_baseline:
+            with open(args.save_baseline, "w") as file:
+                json.dump(report, file, indent=2)
+
+        if args.baseline:
+            with open(args.baseline) as file:
+                regressions = compare(results, json.load(file)["results"], args.tolerance)
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+            if regressions and args.fail_on_regression:
+                return 1
+        return 0
+    finally:
+        if cleanup:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
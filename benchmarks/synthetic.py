@@ -0,0 +1,106 @@
+import os
+import csv
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import Stock, StockPrice
+from app.price_store import PRICE_COLUMNS
+
+# First trading day of every synthetic history
+START_DATE = "1990-01-01"
+
+
+def synthetic_stocks(n_tickers: int) -> List[Dict]:
+    """
+    Return ``n_tickers`` stock rows named so that ``find_stock_for_file`` maps
+    ``<ticker>.csv`` back to them.
+    """
+    return [
+        {
+            "company_name": f"Synthetic {ticker} Corp",
+            "ticker_symbol": ticker,
+            "date_founded": None,
+            "industry": "Synthetic",
+        }
+        for ticker in (f"S{number:04d}" for number in range(n_tickers))
+    ]
+
+
+def synthetic_prices(ticker_number: int, n_days: int, seed: int = 0) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Deterministic OHLCV history of one ticker over ``n_days`` business days.
+
+    Closes follow a geometric random walk; open, high, low and volume are drawn
+    around it. The same (ticker_number, n_days, seed) always gives the same data.
+    """
+    rng = np.random.default_rng([seed, ticker_number])
+    dates = np.busday_offset(START_DATE, np.arange(n_days), roll="forward")
+    close = 10.0 + 90.0 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n_days)))
+    previous = np.concatenate(([close[0]], close[:-1]))
+    open_ = previous * np.exp(rng.normal(0.0, 0.005, n_days))
+    high = np.maximum(open_, close) * (1.0 + np.abs(rng.normal(0.0, 0.01, n_days)))
+    low = np.minimum(open_, close) * (1.0 - np.abs(rng.normal(0.0, 0.01, n_days)))
+    volume = rng.integers(100_000, 10_000_000, n_days, dtype=np.int64)
+    columns = {
+        "open_price": np.round(open_, 6),
+        "high_price": np.round(high, 6),
+        "low_price": np.round(low, 6),
+        "close_price": np.round(close, 6),
+        "adj_close_price": np.round(close, 6),
+        "volume": volume,
+    }
+    return dates, columns
+
+
+def _price_rows(ticker_symbol: str, dates: np.ndarray, columns: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    for values in zip(dates.astype(object).tolist(), *(columns[name].tolist() for name in PRICE_COLUMNS)):
+        row = dict(zip(("date",) + PRICE_COLUMNS, values))
+        row["ticker_symbol"] = ticker_symbol
+        yield row
+
+
+def populate_database(db: Session, n_tickers: int, n_days: int, seed: int = 0, chunk_size: int = 50_000) -> int:
+    """
+    Insert the synthetic stocks and their prices. Returns the number of price rows.
+    """
+    stocks = synthetic_stocks(n_tickers)
+    db.execute(insert(Stock), stocks)
+    rows = 0
+    batch = []
+    for number, stock in enumerate(stocks):
+        dates, columns = synthetic_prices(number, n_days, seed)
+        batch.extend(_price_rows(stock["ticker_symbol"], dates, columns))
+        if len(batch) >= chunk_size:
+            db.execute(insert(StockPrice), batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(StockPrice), batch)
+        rows += len(batch)
+    db.commit()
+    return rows
+
+
+def write_csv_files(directory: str, n_tickers: int, n_days: int, seed: int = 0) -> List[str]:
+    """
+    Write one CSV per synthetic ticker in the layout of ``data/`` and return the paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number, stock in enumerate(synthetic_stocks(n_tickers)):
+        dates, columns = synthetic_prices(number, n_days, seed)
+        path = os.path.join(directory, f"{stock['ticker_symbol']}.csv")
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["Date", "Open", "High", "Low", "Close", "Adj Close", "Volume"])
+            writer.writerows(
+                zip(
+                    dates.astype(str).tolist(),
+                    *(columns[name].tolist() for name in PRICE_COLUMNS),
+                )
+            )
+        paths.append(path)
+    return paths